@@ -0,0 +1,122 @@
+"""Compare single-project loading with and without the byte pre-filter.
+
+First checks project_filter() on fixed lines written in ways JSON allows
+but Claude Code does not use (escaped slashes, \\u escapes, spacing,
+nested and duplicate "project" keys): it must accept every line whose
+parse belongs to the project, and load_history(project=...) must return
+the same entries as filtering the full parse.  Then checks the same for
+every project in a history, and reports how long each approach takes
+for the largest project.
+
+    python benchmarks/bench_project_filter.py [--claude-dir DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from extract_recipe.history import (
+    MALFORMED_ERRORS,
+    filter_by_project,
+    load_history,
+    parse_entry,
+    project_filter,
+)
+
+# The project the fixtures are checked against: JSON may escape its
+# slashes and its non-ASCII letter
+FIXTURE_PROJECT = "/home/zoë/src/app"
+
+_REST = r'"display": "fix it", "pastedContents": {}, "timestamp": 1700000000000, "sessionId": "s1"'
+
+# (description, history line)
+FIXTURES = [
+    ("\\u escape", r'{%s, "project": "/home/zo\u00eb/src/app"}' % _REST),
+    ("UTF-8", '{%s, "project": "/home/zoë/src/app"}' % _REST),
+    ("compact", r'{"display":"x","pastedContents":{},"timestamp":1,"project":"/home/zoë/src/app"}'),
+    ("escaped slashes", r'{%s, "project": "\/home\/zoë\/src\/app"}' % _REST),
+    ("escaped letters", r'{%s, "project": "/home/\u007ao\u00EB/src/app"}' % _REST),
+    ("space before colon", r'{%s, "project" : "/home/zoë/src/app"}' % _REST),
+    ("two spaces after colon", r'{%s, "project":  "/home/zoë/src/app"}' % _REST),
+    ("tab after colon", '{%s, "project":\t"/home/zoë/src/app"}' % _REST),
+    ("nested key first", r'{"meta": {"project": "/other"}, %s, "project": "/home/zoë/src/app"}' % _REST),
+    ("nested key last", r'{%s, "project": "/home/zoë/src/app", "meta": {"project": "/other"}}' % _REST),
+    ("duplicate key, ours last", r'{"project": "/other", %s, "project": "/home/zoë/src/app"}' % _REST),
+    ("duplicate key, ours first", r'{"project": "/home/zoë/src/app", %s, "project": "/other"}' % _REST),
+    ("key in display", r'{"display": "\"project\": \"/other\"", "pastedContents": {}, "timestamp": 1, "project": "/home/zoë/src/app"}'),
+    ("other project", r'{%s, "project": "/other"}' % _REST),
+    ("longer path", r'{%s, "project": "/home/zoë/src/app2"}' % _REST),
+    ("shorter path", r'{%s, "project": "/home/zoë/src"}' % _REST),
+]
+
+
+def check_fixtures() -> None:
+    """Exit with an error if the filter drops a fixture line of the project."""
+    may_match = project_filter(FIXTURE_PROJECT)
+    lines = [line.encode("utf-8") for _, line in FIXTURES]
+    ours = 0
+    for (description, _), line in zip(FIXTURES, lines):
+        try:
+            belongs = parse_entry(line).project == FIXTURE_PROJECT
+        except MALFORMED_ERRORS as e:
+            print(f"fixture {description!r} does not parse: {e}", file=sys.stderr)
+            sys.exit(1)
+        ours += belongs
+        if belongs and not may_match(line):
+            print(f"MISMATCH: filter rejects fixture {description!r}", file=sys.stderr)
+            sys.exit(1)
+    # The last fixtures are plainly written lines of other projects, which
+    # the filter exists to reject
+    for (description, _), line in list(zip(FIXTURES, lines))[-3:]:
+        if may_match(line):
+            print(f"filter accepts fixture {description!r}; it should not", file=sys.stderr)
+            sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        claude_dir = Path(tmp)
+        (claude_dir / "history.jsonl").write_bytes(b"\n".join(lines) + b"\n")
+        direct = load_history(claude_dir, project=FIXTURE_PROJECT)
+        if direct != filter_by_project(load_history(claude_dir), FIXTURE_PROJECT):
+            print("MISMATCH: load_history(project=...) on the fixtures", file=sys.stderr)
+            sys.exit(1)
+    print(f"fixtures:   {len(FIXTURES)} lines, {ours} of the project, all accepted")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--claude-dir", type=Path, default=Path.home() / ".claude",
+        help="Claude config directory to read (default: ~/.claude)",
+    )
+    args = parser.parse_args()
+
+    check_fixtures()
+
+    start = time.perf_counter()
+    everything = load_history(args.claude_dir)
+    full = time.perf_counter() - start
+
+    counts = {}
+    for e in everything:
+        counts[e.project] = counts.get(e.project, 0) + 1
+    for project in counts:
+        if load_history(args.claude_dir, project=project) != filter_by_project(everything, project):
+            print(f"MISMATCH for project {project!r}", file=sys.stderr)
+            sys.exit(1)
+
+    largest = max(counts, key=counts.get)
+    start = time.perf_counter()
+    load_history(args.claude_dir, project=largest)
+    filtered = time.perf_counter() - start
+    print(f"history:    {len(everything)} entries in {len(counts)} projects, results identical")
+    print(f"full parse: {full:.3f}s")
+    print(f"pre-filter: {filtered:.3f}s for {counts[largest]} entries of the largest project "
+          f"({full / filtered:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare redact() with plain sequential substitution.
+
+Builds a synthetic corpus containing every kind of default [redact]
+match, split into prompt-sized blocks as the CLI redacts them.  Checks
+that redact() gives exactly the same output as running every pattern
+with re.sub in turn, then reports the time each takes.
+
+    python benchmarks/bench_redact.py [--mb SIZE] [--config FILE]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from extract_recipe.boilerplate import init as init_config
+from extract_recipe.boilerplate import redact_patterns
+from extract_recipe.redact import _UUID_RE, redact
+
+_SAMPLES = [
+    "/Users/alice/src/project/main.py",
+    "/home/bob/.claude/projects/x/abc.jsonl",
+    "/tmp/carol/build.log",
+    "AKIA" + "ABCDEFGHIJKLMNOP",
+    "ghp_" + "a1" * 20,
+    "github_pat_" + "A_" * 31,
+    "sk-ant-api03-" + "x" * 40,
+    "sk-proj-" + "y" * 30,
+    "sk-" + "Z" * 32,
+    "AIza" + "q" * 35,
+    "2026-01-24 00:04:35 UTC",
+    "3f2b8c1e-9d4a-4b6f-8e2c-1a7d5f9e0b3c",
+]
+
+_WORDS = (
+    "the parser should handle nested sessions and write the output file "
+    "before redacting paths keys timestamps and identifiers in prompts"
+).split()
+
+
+def make_blocks(size: int, seed: int = 0) -> List[str]:
+    """Return roughly size characters of prose blocks, some with secrets."""
+    rng = random.Random(seed)
+    blocks = []
+    total = 0
+    while total < size:
+        lines = []
+        for _ in range(rng.randint(1, 8)):
+            line = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 25)))
+            if rng.random() < 0.1:
+                line += " " + rng.choice(_SAMPLES)
+            lines.append(line)
+        block = "\n".join(lines)
+        blocks.append(block)
+        total += len(block)
+    return blocks
+
+
+def redact_sequential(text: str) -> str:
+    """Reference: every pattern as its own re.sub, as redact() once did."""
+    for pattern, replacement in redact_patterns():
+        text = pattern.sub(replacement, text)
+    return _UUID_RE.sub("[UUID]", text)
+
+
+def _time(fn, blocks: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for block in blocks:
+            fn(block)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=10.0, help="corpus size in MB (default: 10)")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs (default: 3)")
+    parser.add_argument("--config", type=Path, metavar="FILE", help="pattern config file")
+    args = parser.parse_args()
+
+    init_config(args.config)
+    blocks = make_blocks(int(args.mb * 1024 * 1024))
+
+    for block in blocks:
+        if redact(block) != redact_sequential(block):
+            print(f"MISMATCH on block: {block!r}", file=sys.stderr)
+            sys.exit(1)
+
+    sequential = _time(redact_sequential, blocks, args.repeat)
+    guarded = _time(redact, blocks, args.repeat)
+    size = sum(len(b) for b in blocks)
+    print(f"corpus:     {size / 1e6:.1f} MB in {len(blocks)} blocks, outputs identical")
+    print(f"sequential: {sequential:.3f}s")
+    print(f"redact():   {guarded:.3f}s ({sequential / guarded:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
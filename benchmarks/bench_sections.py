@@ -0,0 +1,90 @@
+"""Compare combined [skip]/[plan]/[strip] matching with per-pattern loops.
+
+Runs should_skip(), is_plan() and strip_boilerplate() over every prompt
+in a history and checks each result against trying the section's
+patterns one by one, then reports the time each approach takes.
+--extra N appends N more anchored slash-command [skip] patterns, to
+show how the cost grows with the config.
+
+    python benchmarks/bench_sections.py [--claude-dir DIR] [--extra N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from extract_recipe import boilerplate
+from extract_recipe.history import iter_history
+
+_sections = {}
+
+
+def _loop_skip(display: str) -> bool:
+    return any(p.search(display) for p in _sections.get("skip", []))
+
+
+def _loop_plan(display: str) -> bool:
+    return any(p.search(display) for p in _sections.get("plan", []))
+
+
+def _loop_strip(text: str) -> str:
+    for pattern in _sections.get("strip", []):
+        text = pattern.sub("", text)
+    return text
+
+
+def _time(fns, displays: List[str]) -> float:
+    start = time.perf_counter()
+    for fn in fns:
+        for display in displays:
+            fn(display)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--claude-dir", type=Path, default=Path.home() / ".claude",
+        help="Claude config directory to read (default: ~/.claude)",
+    )
+    parser.add_argument("--config", type=Path, metavar="FILE", help="pattern config file")
+    parser.add_argument("--extra", type=int, default=0, metavar="N",
+                        help="add N synthetic [skip] patterns")
+    args = parser.parse_args()
+
+    config = args.config
+    if args.extra:
+        text = (config or boilerplate._default_conf()).read_text(encoding="utf-8")
+        extra = "".join(rf"^/command{i}\s*$" + "\n" for i in range(args.extra))
+        tmp = tempfile.NamedTemporaryFile("w", suffix=".conf", delete=False)
+        with tmp:
+            tmp.write(text + "\n[skip]\n" + extra)
+        config = Path(tmp.name)
+    boilerplate.init(config)
+    _sections.update(boilerplate.load_config(config)[0])
+    if args.extra:
+        config.unlink()  # already parsed
+
+    displays = [e.display for e in iter_history(args.claude_dir)]
+    combined = (boilerplate.should_skip, boilerplate.is_plan, boilerplate.strip_boilerplate)
+    loops = (_loop_skip, _loop_plan, _loop_strip)
+    for display in displays:
+        for fast, slow in zip(combined, loops):
+            if fast(display) != slow(display):
+                print(f"MISMATCH in {fast.__name__} on {display[:80]!r}", file=sys.stderr)
+                sys.exit(1)
+
+    loop = _time(loops, displays)
+    fast = _time(combined, displays)
+    print(f"prompts:  {len(displays)}, results identical")
+    print(f"loops:    {loop:.3f}s")
+    print(f"combined: {fast:.3f}s ({loop / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Measure extract-recipe start-up cost.
+
+Runs `python -X importtime` on the CLI module and prints the slowest
+imports (cumulative microseconds, as reported by the interpreter), then
+times `extract-recipe --help` end to end and checks that it did not
+load the pattern config.
+
+    python benchmarks/bench_startup.py [--top N] [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+# Runs --help in-process, then reports whether the config was loaded
+_HELP_PROBE = """
+import contextlib, io, sys
+from extract_recipe import boilerplate, cli
+sys.argv = ["extract-recipe", "--help"]
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        cli.main()
+    except SystemExit:
+        pass
+print(boilerplate._config is not None)
+"""
+
+
+def import_times() -> List[Tuple[int, int, str]]:
+    """Return (self us, cumulative us, module) for importing the CLI."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import extract_recipe.cli"],
+        capture_output=True, text=True, check=True, env=os.environ,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            rows.append((int(fields[0]), int(fields[1]), fields[2].strip()))
+        except ValueError:
+            continue  # the header line
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15, help="imports to list (default: 15)")
+    parser.add_argument("--repeat", type=int, default=5, help="best of N runs (default: 5)")
+    args = parser.parse_args()
+
+    rows = import_times()
+    total = next((cum for _, cum, name in rows if name == "extract_recipe.cli"), 0)
+    print(f"import extract_recipe.cli: {total / 1000:.1f} ms")
+    print(f"{'self ms':>8}  {'cum ms':>8}  module")
+    for own, cum, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"{own / 1000:>8.1f}  {cum / 1000:>8.1f}  {name}")
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        probe = subprocess.run(
+            [sys.executable, "-c", _HELP_PROBE],
+            capture_output=True, text=True, check=True, env=os.environ,
+        )
+        best = min(best, time.perf_counter() - start)
+    print(f"\nextract-recipe --help: {best * 1000:.1f} ms (best of {args.repeat})")
+    if probe.stdout.strip() != "False":
+        print("FAIL: --help loaded the pattern config", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Time each pipeline stage and the main CLI modes on a synthetic history.
+
+Generates a ~/.claude directory with synth.py (or uses --claude-dir),
+then:
+
+  - times each stage in-process (parse, skip/strip, grouping, paste
+    resolution, redaction, each formatter, project statistics), best of
+    --repeat runs
+  - runs the CLI in a child process for --list, a single project, -a,
+    --audit and -r, with and without the history index and render
+    cache, recording the best wall time and the child's peak RSS
+
+Results are printed and, with -o, written as JSON together with the
+commit, Python version and generator options.  --compare OLD.json
+prints each figure relative to an earlier run, e.g. of another commit:
+
+    python benchmarks/bench_suite.py -o before.json
+    git checkout my-branch
+    python benchmarks/bench_suite.py -o after.json --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from synth import add_arguments, generate, options_from
+
+from extract_recipe.cli import _prepare
+from extract_recipe.formatter import format_all_json, format_audit, format_markdown
+from extract_recipe.history import (
+    PromptEntry,
+    iter_history,
+    list_projects,
+    load_history,
+    partition_by_project,
+)
+from extract_recipe.paste import PasteStore, paste_sizes, resolve_pastes
+from extract_recipe.redact import redact
+
+RESULTS_VERSION = 1
+
+
+def _best(fn: Callable[[], object], repeat: int) -> Tuple[float, object]:
+    """Return the best time of repeat calls and the last result."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _peak_rss(usage) -> int:
+    """ru_maxrss in bytes (reported in kilobytes except on macOS)."""
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def _resolve_all(entries: List[PromptEntry], store: PasteStore) -> List[str]:
+    return [resolve_pastes(e, store) for e in entries]
+
+
+def time_stages(claude_dir: Path, repeat: int) -> Dict[str, float]:
+    """Time each pipeline stage in this process."""
+    paste_dir = claude_dir / "paste-cache"
+    stages: Dict[str, float] = {}
+
+    stages["load_history"], entries = _best(lambda: load_history(claude_dir), repeat)
+    # _prepare() strips in place, so each run gets a fresh parse
+    fresh = [load_history(claude_dir) for _ in range(repeat)]
+    stages["skip_and_strip"], prepared = _best(lambda: _prepare(fresh.pop(), raw=False), repeat)
+    stages["partition_by_project"], projects = _best(
+        lambda: list(partition_by_project(prepared)), repeat
+    )
+    # A new store per run, so every run reads the paste files
+    stages["resolve_pastes"], resolved = _best(
+        lambda: _resolve_all(prepared, PasteStore(paste_dir)), repeat
+    )
+    stages["redact"], _ = _best(lambda: [redact(text) for text in resolved], repeat)
+    stages["format_markdown"], _ = _best(
+        lambda: [format_markdown(p, sessions, paste_dir) for p, sessions in projects], repeat
+    )
+    stages["format_json"], _ = _best(lambda: format_all_json(projects, paste_dir), repeat)
+    stages["format_audit"], _ = _best(lambda: format_audit(prepared), repeat)
+    stages["list_projects"], _ = _best(
+        lambda: list_projects(entries, paste_sizes(paste_dir)), repeat
+    )
+    return stages
+
+
+def _modes(project: str) -> Dict[str, List[str]]:
+    return {
+        "list": ["--list"],
+        "list --no-cache": ["--list", "--no-cache"],
+        "project": [project],
+        "project --no-cache": [project, "--no-cache"],
+        "project -r": [project, "-r"],
+        "project --format json": [project, "--format", "json"],
+        "-a": ["-a"],
+        "-a -r": ["-a", "-r"],
+        "-a -r --no-cache": ["-a", "-r", "--no-cache"],
+        "-a --format json": ["-a", "--format", "json"],
+        "audit": ["--audit"],
+    }
+
+
+def _run_cli(args: List[str], env: Dict[str, str]) -> Tuple[float, Optional[int], int]:
+    """Run the CLI once; return (seconds, peak RSS in bytes, exit status)."""
+    command = [sys.executable, "-m", "extract_recipe.cli", *args]
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env,
+    )
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        return elapsed, _peak_rss(usage), proc.returncode
+    proc.wait()
+    return time.perf_counter() - start, None, proc.returncode
+
+
+def time_modes(
+    claude_dir: Path, project: str, repeat: int, cache_dir: Path
+) -> Dict[str, dict]:
+    """Time each CLI mode in child processes sharing a scratch index."""
+    env = dict(os.environ)
+    env["XDG_CACHE_HOME"] = str(cache_dir)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+    base = ["--claude-dir", str(claude_dir)]
+    _run_cli(base + ["--list"], env)  # build the index
+
+    modes: Dict[str, dict] = {}
+    for name, args in _modes(project).items():
+        best, peak, status = float("inf"), None, 0
+        for _ in range(repeat):
+            elapsed, rss, status = _run_cli(base + args, env)
+            best = min(best, elapsed)
+            if rss is not None:
+                peak = max(peak or 0, rss)
+        modes[name] = {"args": args, "seconds": best, "peak_rss": peak, "status": status}
+    return modes
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            check=True, cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _ratio(new: Optional[float], old: Optional[float]) -> str:
+    if not new or not old:
+        return ""
+    return f"  ({new / old:.2f}x of {old:.3f})" if old >= 0.001 else ""
+
+
+def report(results: dict, baseline: Optional[dict] = None) -> None:
+    old_stages = (baseline or {}).get("stages", {})
+    old_modes = (baseline or {}).get("modes", {})
+    history = results["history"]
+    print(
+        f"history: {history['entries']} entries in {history['projects']} projects "
+        f"({history['bytes'] / 1e6:.1f} MB)"
+    )
+    print("\nstage                       seconds")
+    for name, seconds in results["stages"].items():
+        print(f"  {name:<24}  {seconds:8.3f}{_ratio(seconds, old_stages.get(name))}")
+    print("\nmode                        seconds  peak RSS")
+    for name, mode in results["modes"].items():
+        rss = f"{mode['peak_rss'] / 2**20:6.1f} MB" if mode["peak_rss"] else "       -"
+        failed = f"  exit {mode['status']}" if mode["status"] else ""
+        old = old_modes.get(name, {}).get("seconds")
+        print(f"  {name:<24}  {mode['seconds']:8.3f}  {rss}{_ratio(mode['seconds'], old)}{failed}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        epilog="The remaining options shape the generated history (see synth.py).",
+    )
+    parser.add_argument(
+        "--claude-dir", type=Path,
+        help="benchmark an existing Claude config directory instead of a generated one",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs (default: 3)")
+    parser.add_argument("-o", type=Path, metavar="FILE", help="write results as JSON to FILE")
+    parser.add_argument("--compare", type=Path, metavar="FILE",
+                        help="show figures relative to the results in FILE")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+
+    with tempfile.TemporaryDirectory(prefix="extract-recipe-bench-") as tmp:
+        scratch = Path(tmp)
+        claude_dir = args.claude_dir
+        synth = None
+        if claude_dir is None:
+            claude_dir = scratch / "claude"
+            synth = options_from(args)
+            generate(claude_dir, synth)
+        history_bytes = (claude_dir / "history.jsonl").stat().st_size
+
+        # Modes run first: a child's peak RSS includes the parent's, so
+        # the parent must not have loaded the history yet
+        with contextlib.redirect_stderr(io.StringIO()):
+            counts = Counter(e.project for e in iter_history(claude_dir))
+        largest = max(counts, key=counts.get)
+        modes = time_modes(claude_dir, largest, args.repeat, scratch / "cache")
+        with contextlib.redirect_stderr(io.StringIO()):
+            stages = time_stages(claude_dir, args.repeat)
+
+    results = {
+        "version": RESULTS_VERSION,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "synth": asdict(synth) if synth else None,
+        "history": {
+            "bytes": history_bytes,
+            "projects": len(counts),
+            "entries": sum(counts.values()),
+        },
+        "stages": stages,
+        "modes": modes,
+    }
+    report(results, baseline)
+    if args.o:
+        args.o.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"\nWritten to {args.o}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Generate a synthetic ~/.claude directory for benchmarks.
+
+Writes history.jsonl and paste-cache/ with the kinds of content the
+pipeline has to handle:
+
+  - prompts of varying length, some multi-line or non-ASCII
+  - home paths, API keys, timestamps and UUIDs for redaction
+  - housekeeping commands for [skip]
+  - plan-mode prompts carrying a transcript path for [strip]
+  - /clear and /compact context breaks
+  - pasted text, a fraction of whose cache files are missing
+  - entries without a session ID, and malformed lines
+
+Sessions of different projects interleave as they do in real use.  The
+same seed and options always give the same directory.
+
+    python benchmarks/synth.py DIR [--projects N] [--entries N] ...
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List
+
+_WORDS = (
+    "the parser should handle nested sessions and write the output file "
+    "before we refactor config loading also add tests for each module "
+    "please fix this bug in widget rendering when history grows large"
+).split()
+
+_CAPITALISED = "Alice Bob Carol Python Django Widget Parser Config Kubernetes Postgres".split()
+
+_SECRETS = [
+    "AKIA" + "ABCDEFGHIJKLMNOP",
+    "ghp_" + "a1" * 20,
+    "sk-ant-api03-" + "x" * 40,
+    "2026-01-24 00:04:35 UTC",
+    "3f2b8c1e-9d4a-4b6f-8e2c-1a7d5f9e0b3c",
+]
+
+_SKIPPED = ["/config", "/login", "/status", "/statusline show model", "/upgrade"]
+
+_BREAKS = ["/clear", "/compact", "/compact keep the API notes"]
+
+
+@dataclass
+class SynthOptions:
+    """Shape of the generated history."""
+    projects: int = 15
+    entries: int = 20000
+    sessions: int = 8
+    paste_rate: float = 0.1
+    pastes_per_prompt: int = 3
+    paste_lines: int = 40
+    missing_paste_rate: float = 0.05
+    malformed_rate: float = 0.005
+    seed: int = 0
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(4, 20))]
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(_CAPITALISED))
+    if rng.random() < 0.05:
+        words.append("café naïve 日本語")
+    return " ".join(words)
+
+
+def _prompt(rng: random.Random, user: str) -> str:
+    lines = [_sentence(rng) for _ in range(1 if rng.random() < 0.7 else rng.randint(2, 12))]
+    if rng.random() < 0.2:
+        lines.append(f"see /{rng.choice(['home', 'Users'])}/{user}/src/app/main.py")
+    if rng.random() < 0.05:
+        lines.append(rng.choice(_SECRETS))
+    return "\n".join(lines)
+
+
+def _paste(rng: random.Random, lines: int) -> str:
+    return "\n".join(
+        f"{i:4d}  {_sentence(rng)}" for i in range(max(1, int(rng.expovariate(1 / lines))))
+    )
+
+
+def generate(claude_dir: Path, options: SynthOptions) -> Dict[str, int]:
+    """Write a synthetic history to claude_dir; return what was written."""
+    rng = random.Random(options.seed)
+    paste_dir = claude_dir / "paste-cache"
+    paste_dir.mkdir(parents=True, exist_ok=True)
+
+    users = ["alice", "bob", "carol"]
+    projects = [
+        f"/{'home' if i % 3 else 'Users'}/{users[i % len(users)]}/src/project-{i}"
+        for i in range(options.projects)
+    ]
+    # Earlier projects get more prompts, as real histories are skewed
+    weights = [1 / (i + 1) for i in range(len(projects))]
+    sessions: Dict[str, List[str]] = {
+        p: ["%032x" % rng.getrandbits(128) for _ in range(options.sessions)] for p in projects
+    }
+
+    stats = {"entries": 0, "malformed": 0, "pastes": 0, "missing_pastes": 0}
+    timestamp = 1_700_000_000_000
+    with open(claude_dir / "history.jsonl", "w", encoding="utf-8") as f:
+        for _ in range(options.entries):
+            project = rng.choices(projects, weights)[0]
+            user = project.split("/")[2]
+            timestamp += rng.randint(1_000, 120_000)
+
+            r = rng.random()
+            pasted: Dict[str, dict] = {}
+            if r < 0.03:
+                display = rng.choice(_SKIPPED)
+            elif r < 0.06:
+                display = rng.choice(_BREAKS)
+            elif r < 0.08:
+                display = (
+                    "Implement the following plan:\n\n# Plan: " + _sentence(rng)
+                    + "\n\n" + _prompt(rng, user)
+                    + f"\n\nRead the full transcript at: /home/{user}/.claude/projects/"
+                    + f"-src-app/{rng.choice(sessions[project])}.jsonl"
+                )
+            else:
+                display = _prompt(rng, user)
+                if rng.random() < options.paste_rate:
+                    for n in range(1, rng.randint(1, options.pastes_per_prompt) + 1):
+                        content = _paste(rng, options.paste_lines)
+                        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+                        if rng.random() < options.missing_paste_rate:
+                            stats["missing_pastes"] += 1
+                        else:
+                            (paste_dir / f"{content_hash}.txt").write_text(content, encoding="utf-8")
+                        stats["pastes"] += 1
+                        pasted[str(n)] = {"id": n, "type": "text", "contentHash": content_hash}
+                        display += f" [Pasted text #{n} +{content.count(chr(10)) + 1} lines]"
+
+            obj = {"display": display, "pastedContents": pasted, "timestamp": timestamp, "project": project}
+            if rng.random() < 0.95:
+                obj["sessionId"] = rng.choice(sessions[project])
+            f.write(json.dumps(obj, ensure_ascii=rng.random() < 0.5) + "\n")
+            stats["entries"] += 1
+            if rng.random() < options.malformed_rate:
+                f.write(rng.choice(['{"display": "truncated', "{bad json", "[]"]) + "\n")
+                stats["malformed"] += 1
+    return stats
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add a --flag for each SynthOptions field to parser."""
+    for name, default in asdict(SynthOptions()).items():
+        parser.add_argument(
+            "--" + name.replace("_", "-"), type=type(default), default=default,
+            help=f"(default: {default})",
+        )
+
+
+def options_from(args: argparse.Namespace) -> SynthOptions:
+    return SynthOptions(**{name: getattr(args, name) for name in asdict(SynthOptions())})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("claude_dir", type=Path, metavar="DIR", help="directory to create")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    stats = generate(args.claude_dir, options_from(args))
+    size = (args.claude_dir / "history.jsonl").stat().st_size
+    print(
+        f"{args.claude_dir}: {stats['entries']} entries ({size / 1e6:.1f} MB), "
+        f"{stats['pastes']} pastes ({stats['missing_pastes']} missing), "
+        f"{stats['malformed']} malformed lines"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,16 +7,37 @@ Lookup order:
 
 If a user config exists it replaces the package defaults entirely.
 Use --init-config to copy the package defaults to the user config location.
+
+A pattern may start with a (?#max-input=N) comment to be applied only
+to texts of at most N characters; longer texts are left as they are by
+that pattern, with a warning.  This bounds the cost of a pattern whose
+matching time grows faster than linearly (see --check-config).  It is
+not allowed in [redact], where it would leave long texts unredacted:
+a config that uses it there is rejected when loaded.
+
+Nothing is read at import time.  The config is loaded by init(), or on
+first use, and each section is only compiled when something asks for
+it, so --help, --init-config and --list (which takes its skip flags
+from the index) compile few or no regexes, and --audit-stopwords are
+compiled only for --audit.  Parsed configs are cached per process,
+keyed on path, mtime and size.
 """
 
 from __future__ import annotations
 
+import hashlib
 import importlib.resources
 import re
 import shutil
+import sys
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse as _sre_parse  # type: ignore[no-redef]
+
 # Sections where each line is a plain regex
 _PLAIN_SECTIONS = {"strip", "skip", "plan"}
 
@@ -31,7 +52,7 @@ _DEFAULT_USER_CONFIG = Path.home() / ".config" / "extract-recipe" / "patterns.co
 
 
 def _parse_conf(text: str, sections: Dict, pairs: Dict) -> None:
-    """Parse a conf file, appending to sections and pairs dicts."""
+    """Parse a conf file, appending pattern strings to sections and pairs."""
     current = "strip"  # default section
 
     for line in text.splitlines():
@@ -46,13 +67,18 @@ def _parse_conf(text: str, sections: Dict, pairs: Dict) -> None:
             # Split on last " = " to allow = in patterns
             if " = " in line:
                 pattern_str, replacement = line.rsplit(" = ", 1)
-                pairs.setdefault(current, []).append(
-                    (re.compile(pattern_str), replacement)
-                )
+                if _MAX_INPUT_RE.match(pattern_str):
+                    # Longer texts would be passed over, i.e. not redacted
+                    print(
+                        f"Error: (?#max-input=N) is not allowed in [{current}] "
+                        f"(pattern {pattern_str!r}); rewrite the pattern instead",
+                        file=sys.stderr,
+                    )
+                    sys.exit(1)
+                pairs.setdefault(current, []).append((pattern_str, replacement))
             continue
 
-        flags = re.IGNORECASE if current in _ICASE_SECTIONS else 0
-        sections.setdefault(current, []).append(re.compile(line, flags))
+        sections.setdefault(current, []).append(line)
 
 
 def _default_conf() -> importlib.resources.abc.Traversable:
@@ -70,16 +96,11 @@ def load_config(user_config: Optional[Path] = None) -> Tuple[
       sections: {name: [compiled regex, ...]} for plain pattern sections
       pairs:    {name: [(compiled regex, replacement), ...]} for pair sections
     """
-    sections: Dict[str, List[re.Pattern]] = {}
-    pairs: Dict[str, List[Tuple[re.Pattern, str]]] = {}
-
-    config_path = user_config or _DEFAULT_USER_CONFIG
-    if config_path.exists():
-        _parse_conf(config_path.read_text(encoding="utf-8"), sections, pairs)
-    else:
-        _parse_conf(_default_conf().read_text(encoding="utf-8"), sections, pairs)
-
-    return sections, pairs
+    config = _read_config(user_config)
+    return (
+        {name: config.patterns(name) for name in config.lines},
+        {name: config.pairs(name) for name in config.pair_lines},
+    )
 
 
 def init_user_config(target: Optional[Path] = None) -> Path:
@@ -95,44 +116,305 @@ def init_user_config(target: Optional[Path] = None) -> Path:
     return dest
 
 
-# Module-level defaults (loaded without user config override;
-# cli.py calls init() with the resolved config path)
-_sections: Dict[str, List[re.Pattern]] = {}
-_pairs: Dict[str, List[Tuple[re.Pattern, str]]] = {}
+# A leading (?#max-input=N) comment, limiting the texts a pattern sees
+_MAX_INPUT_RE = re.compile(r"^\(\?#\s*max-input\s*=\s*(\d+)\s*\)")
+
+# (section, pattern) pairs already warned about by warn_max_input()
+_warned_max_input: set = set()
+
+
+def max_input(pattern: re.Pattern) -> Optional[int]:
+    """Return the (?#max-input=N) limit of pattern, if it has one."""
+    m = _MAX_INPUT_RE.match(pattern.pattern)
+    return int(m.group(1)) if m else None
+
+
+def warn_max_input(section: str, pattern: re.Pattern, length: int) -> None:
+    """Report, once per pattern, that a text was too long for it."""
+    if (section, pattern.pattern) in _warned_max_input:
+        return
+    _warned_max_input.add((section, pattern.pattern))
+    print(
+        f"Warning: [{section}] pattern {pattern.pattern!r} not applied to a "
+        f"{length}-character text (and possibly others) over its max-input",
+        file=sys.stderr,
+    )
+
+
+def required_literal(pattern: re.Pattern) -> Optional[str]:
+    """Return a substring every match of pattern must contain, if any.
+
+    This is the longest run of plain characters at the top level of the
+    pattern (e.g. "AKIA" for AKIA[0-9A-Z]{16}), so text that does not
+    contain it cannot match and the regex need not be run at all.
+    Returns None for case-insensitive patterns and patterns with no such
+    run, such as a top-level alternation.
+    """
+    if pattern.flags & re.IGNORECASE:
+        return None
+    try:
+        items = _sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+    best = run = ""
+    for op, arg in items:
+        if op is _sre_parse.LITERAL:
+            run += chr(arg)
+            if len(run) > len(best):
+                best = run
+        else:
+            run = ""
+    return best or None
+
+
+# Constructs whose meaning changes when group numbers shift
+_BACKREF_RE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+# A leading inline flag group such as (?i), which must become scoped
+_GLOBAL_FLAGS_RE = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+_SCOPED_FLAGS = (
+    (re.ASCII, "a"),
+    (re.IGNORECASE, "i"),
+    (re.MULTILINE, "m"),
+    (re.DOTALL, "s"),
+    (re.VERBOSE, "x"),
+)
+
+
+def combine_patterns(patterns: List[re.Pattern]) -> Optional[re.Pattern]:
+    """Compile patterns into one alternation, in order.
+
+    The result matches (searches, fullmatches) wherever any of the
+    patterns would.  Branches are joined without wrapping groups, so re
+    can factor out a shared prefix such as the ^/ of the [skip]
+    commands.  Returns None if a pattern cannot safely be embedded
+    (backreferences, LOCALE flag, clashing group names), or if patterns
+    is empty.
+    """
+    if not patterns:
+        return None
+    uniform = len({p.flags for p in patterns}) == 1
+    parts = []
+    for p in patterns:
+        if p.flags & re.LOCALE or _BACKREF_RE.search(p.pattern):
+            return None
+        body = _GLOBAL_FLAGS_RE.sub("", p.pattern, count=1)
+        if p.flags & re.VERBOSE:
+            body += "\n"  # keep a trailing comment from swallowing the "|"
+        if not uniform:
+            letters = "".join(letter for flag, letter in _SCOPED_FLAGS if p.flags & flag)
+            if letters:
+                body = f"(?{letters}:{body})"
+        parts.append(body)
+    try:
+        return re.compile("|".join(parts), patterns[0].flags if uniform else 0)
+    except re.error:
+        return None
+
+
+class _Matcher:
+    """The patterns of one plain section, prepared for fast matching.
+
+    combined finds whether any pattern without a max-input limit matches
+    in a single scan; limited patterns are tried one by one, on texts
+    short enough for them.  Each pattern is also paired with its
+    required_literal() and limit, so substitution can skip patterns that
+    cannot match without running them; that matters for unanchored
+    patterns such as the [strip] transcript reference, which re tries at
+    every position of the text.
+    """
+
+    def __init__(self, section: str, patterns: List[re.Pattern]) -> None:
+        self.section = section
+        self.patterns = [p for p in patterns if max_input(p) is None]
+        self.limited = [(p, max_input(p)) for p in patterns if max_input(p) is not None]
+        if len(self.patterns) == 1:
+            self.combined: Optional[re.Pattern] = self.patterns[0]
+        else:
+            self.combined = combine_patterns(self.patterns)
+        self.guarded = [(p, required_literal(p), max_input(p)) for p in patterns]
+
+    def _fits(self, pattern: re.Pattern, limit: int, text: str) -> bool:
+        if len(text) <= limit:
+            return True
+        warn_max_input(self.section, pattern, len(text))
+        return False
+
+    def search(self, text: str) -> bool:
+        """Return True if any pattern matches somewhere in text."""
+        if self.combined is not None:
+            if self.combined.search(text) is not None:
+                return True
+        elif any(p.search(text) for p in self.patterns):
+            return True
+        return any(
+            self._fits(p, limit, text) and p.search(text) is not None
+            for p, limit in self.limited
+        )
+
+    def fullmatch(self, text: str) -> bool:
+        """Return True if any pattern matches the whole of text."""
+        if self.combined is not None:
+            if self.combined.fullmatch(text) is not None:
+                return True
+        elif any(p.fullmatch(text) for p in self.patterns):
+            return True
+        return any(
+            self._fits(p, limit, text) and p.fullmatch(text) is not None
+            for p, limit in self.limited
+        )
+
+    def sub(self, text: str) -> str:
+        """Remove every match of each pattern in turn, as re.sub would."""
+        for p, literal, limit in self.guarded:
+            if literal is not None and literal not in text:
+                continue
+            if limit is not None and not self._fits(p, limit, text):
+                continue
+            text = p.sub("", text)
+        return text
+
+
+class _Config:
+    """A parsed config file whose sections are compiled on first use."""
+
+    def __init__(self, text: str) -> None:
+        self.lines: Dict[str, List[str]] = {}
+        self.pair_lines: Dict[str, List[Tuple[str, str]]] = {}
+        _parse_conf(text, self.lines, self.pair_lines)
+        self._patterns: Dict[str, List[re.Pattern]] = {}
+        self._pairs: Dict[str, List[Tuple[re.Pattern, str]]] = {}
+        self._matchers: Dict[str, _Matcher] = {}
+
+    def patterns(self, name: str) -> List[re.Pattern]:
+        compiled = self._patterns.get(name)
+        if compiled is None:
+            flags = re.IGNORECASE if name in _ICASE_SECTIONS else 0
+            compiled = self._patterns[name] = [
+                re.compile(line, flags) for line in self.lines.get(name, [])
+            ]
+        return compiled
+
+    def pairs(self, name: str) -> List[Tuple[re.Pattern, str]]:
+        compiled = self._pairs.get(name)
+        if compiled is None:
+            compiled = self._pairs[name] = [
+                (re.compile(pattern_str), replacement)
+                for pattern_str, replacement in self.pair_lines.get(name, [])
+            ]
+        return compiled
+
+    def matcher(self, name: str) -> _Matcher:
+        matcher = self._matchers.get(name)
+        if matcher is None:
+            matcher = self._matchers[name] = _Matcher(name, self.patterns(name))
+        return matcher
+
+
+# Parsed configs by (path, mtime_ns, size); None is the package default
+_configs: Dict[Optional[Tuple[str, int, int]], _Config] = {}
+
+
+def _read_config(user_config: Optional[Path] = None) -> _Config:
+    """Return the parsed user config (if it exists) or package defaults."""
+    config_path = user_config or _DEFAULT_USER_CONFIG
+    try:
+        st = config_path.stat()
+        key: Optional[Tuple[str, int, int]] = (str(config_path), st.st_mtime_ns, st.st_size)
+    except OSError:
+        key = None
+    config = _configs.get(key)
+    if config is None:
+        if key is None:
+            text = _default_conf().read_text(encoding="utf-8")
+        else:
+            text = config_path.read_text(encoding="utf-8")
+        config = _configs[key] = _Config(text)
+    return config
+
+
+# The config in use (cli.py calls init() with the resolved config path;
+# otherwise the default lookup is loaded on first use)
+_config: Optional[_Config] = None
 
 
 def init(user_config: Optional[Path] = None) -> None:
     """Initialise patterns from package defaults + user config."""
-    global _sections, _pairs
-    _sections, _pairs = load_config(user_config)
+    global _config
+    _config = _read_config(user_config)
 
 
-# Load package defaults immediately so imports work without init()
-init()
+def _current() -> _Config:
+    if _config is None:
+        init()
+    return _config
 
 
 def strip_boilerplate(text: str) -> str:
     """Remove known system-generated boilerplate from within text."""
-    for pattern in _sections.get("strip", []):
-        text = pattern.sub("", text)
-    return text
+    return _current().matcher("strip").sub(text)
 
 
 def should_skip(display: str) -> bool:
     """Return True if a prompt should be omitted entirely from the recipe."""
-    return any(p.search(display) for p in _sections.get("skip", []))
+    return _current().matcher("skip").search(display)
 
 
 def is_plan(display: str) -> bool:
     """Return True if a prompt is a plan-mode prompt (to be collapsed)."""
-    return any(p.search(display) for p in _sections.get("plan", []))
+    return _current().matcher("plan").search(display)
+
+
+def section_patterns(name: str) -> List[re.Pattern]:
+    """Return the compiled patterns of a plain section, in config order."""
+    return _current().patterns(name)
+
+
+def pattern_sources() -> List[Tuple[str, str, int]]:
+    """Return (section, pattern text, flags) for every loaded pattern.
+
+    The patterns are not compiled, so a pattern that does not compile
+    is listed like any other.
+    """
+    config = _current()
+    sources = []
+    for name, lines in config.lines.items():
+        flags = re.IGNORECASE if name in _ICASE_SECTIONS else 0
+        sources.extend((name, line, flags) for line in lines)
+    for name, pairs in config.pair_lines.items():
+        sources.extend((name, pattern_str, 0) for pattern_str, _ in pairs)
+    return sources
 
 
 def redact_patterns() -> List[Tuple[re.Pattern, str]]:
     """Return the list of (pattern, replacement) pairs for redaction."""
-    return _pairs.get("redact", [])
+    return _current().pairs("redact")
 
 
 def audit_stopwords() -> List[re.Pattern]:
     """Return the list of stopword patterns for audit output."""
-    return _sections.get("audit-stopwords", [])
+    return _current().patterns("audit-stopwords")
+
+
+def is_audit_stopword(word: str) -> bool:
+    """Return True if word fully matches an [audit-stopwords] pattern."""
+    return _current().matcher("audit-stopwords").fullmatch(word)
+
+
+def section_digest(*names: str) -> str:
+    """Return a digest of the loaded patterns in the named sections.
+
+    Used to invalidate caches whose contents depend on the config.
+    Computed from the pattern text, so nothing needs compiling.
+    """
+    config = _current()
+    h = hashlib.sha1()
+    for name in names:
+        h.update(f"[{name}]\n".encode("utf-8"))
+        for line in config.lines.get(name, []):
+            h.update(f"{line}\n".encode("utf-8"))
+        for pattern_str, replacement in config.pair_lines.get(name, []):
+            h.update(f"{pattern_str} = {replacement}\n".encode("utf-8"))
+    return h.hexdigest()
+
@@ -1,18 +1,22 @@
 from __future__ import annotations
 
 import argparse
+import os
 import signal
 import sys
 from difflib import get_close_matches
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Sequence
 
+from extract_recipe import profiling
 from extract_recipe.history import (
-    filter_by_project,
+    PromptEntry,
     group_by_session,
-    list_projects,
     load_history,
+    partition_by_project,
 )
+from extract_recipe.columnar import EntryStore, load_store
+from extract_recipe.index import HistoryIndex, cache_dir, open_index
 from extract_recipe.boilerplate import (
     init as init_config,
     init_user_config,
@@ -20,15 +24,24 @@ from extract_recipe.boilerplate import (
     should_skip,
     strip_boilerplate,
 )
+from extract_recipe.output import Chunk, write_output
+from extract_recipe.paste import get_store, session_hashes
 from extract_recipe.redact import redact
+from extract_recipe.render import join_blocks, join_json, render_projects
+from extract_recipe.rendercache import RenderCache
+from extract_recipe.shard import export_dir
 from extract_recipe.formatter import (
-    format_all_json,
+    LiveRecipe,
     format_audit,
-    format_json,
-    format_markdown,
     format_project_list,
+    iter_json,
+    iter_jsonl,
+    iter_markdown,
 )
 
+if TYPE_CHECKING:
+    from extract_recipe.server import HotHistory
+
 
 def _match_projects(
     target: str, all_paths: List[str], exact: bool
@@ -69,11 +82,55 @@ def _fuzzy_suggest(target: str, all_paths: List[str]) -> List[str]:
     return result
 
 
+def _prepare(entries: Sequence[PromptEntry], raw: bool) -> Sequence[PromptEntry]:
+    """Filter out housekeeping commands and strip boilerplate (unless raw)."""
+    if raw:
+        return entries
+    profile = profiling.current
+    if profile is not None and profile.patterns is not None:
+        with profiling.stage("time_patterns"):
+            profile.time_patterns(e.display for e in entries)
+    skip = profiling.timed_text("skip", should_skip)
+    strip = profiling.timed_text("strip", strip_boilerplate)
+    if isinstance(entries, EntryStore):
+        return entries.filter_display(lambda display: not skip(display)).map_display(strip)
+    entries = [e for e in entries if not skip(e.display)]
+    for e in entries:
+        e.display = strip(e.display)
+    return entries
+
+
+def _load(
+    index: HistoryIndex, claude_dir: Path, projects: List[str], raw: bool,
+    history: Optional[HotHistory] = None,
+) -> Sequence[PromptEntry]:
+    """Return the prepared entries of projects, kept in memory when serving."""
+    if history is not None:
+        return history.load(projects, raw, _prepare)
+    with profiling.stage("load_history"):
+        entries = index.load(claude_dir, projects)
+    return _prepare(entries, raw)
+
+
+def _profile_target(option: Optional[str], patterns: bool) -> Optional[str]:
+    """Return where to report the profile ("-" for stderr), or None.
+
+    --profile takes precedence over EXTRACT_RECIPE_PROFILE, which may be
+    set to 1 for stderr or to a file name.
+    """
+    target = option or os.environ.get("EXTRACT_RECIPE_PROFILE", "")
+    if target in ("", "0"):
+        return "-" if patterns else None
+    return "-" if target == "1" else target
+
 
 def main() -> None:
     # Exit quietly on broken pipe (e.g. piping to head)
     signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    run(sys.argv[1:])
 
+
+def _parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="extract-recipe",
         description="Extract prompt recipes from Claude Code history",
@@ -101,15 +158,23 @@ def main() -> None:
     )
     parser.add_argument(
         "--format",
-        choices=["markdown", "json"],
+        choices=["markdown", "json", "jsonl"],
         default="markdown",
         dest="output_format",
-        help="Output format (default: markdown)",
+        help="Output format: markdown, json, or jsonl (JSON Lines, one "
+        "prompt object per line) (default: markdown)",
+    )
+    parser.add_argument(
+        "--omit-same-raw",
+        action="store_true",
+        help="In json/jsonl output, leave out display_raw when it equals "
+        "display_resolved (prompts without pastes)",
     )
     parser.add_argument(
         "--list",
         action="store_true",
-        help="List all projects with prompt/session counts",
+        help="List all projects with prompt/session counts, date range, "
+        "plan/context-break counts and pasted bytes",
     )
     parser.add_argument(
         "-a", "--all",
@@ -149,6 +214,13 @@ def main() -> None:
         action="store_true",
         help="Copy default pattern config to ~/.config/extract-recipe/patterns.conf for editing",
     )
+    parser.add_argument(
+        "--check-config",
+        action="store_true",
+        help="Time every config pattern on synthetic texts and a sample of the "
+        "history, flagging patterns that fail to compile or whose cost grows "
+        "faster than linearly with the text; exit 1 if any is flagged",
+    )
     parser.add_argument(
         "-t", "--title",
         metavar="TITLE",
@@ -160,9 +232,113 @@ def main() -> None:
         metavar="FILE",
         help="Write output to file instead of stdout",
     )
+    parser.add_argument(
+        "--out-dir",
+        type=Path,
+        metavar="DIR",
+        help="With -a, write one file per project plus manifest.json to DIR, "
+        "re-rendering only projects whose history or pastes changed",
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Use N worker processes to parse history.jsonl when reading the "
+        "whole file (-a, --audit without a project) and to render -a "
+        "projects, and prefetch a single project's pasted content with N "
+        "threads; default: 1",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't read or write the history index or rendered sessions in "
+        "~/.cache/extract-recipe",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        help="Report time, calls and sizes per pipeline stage at exit: to "
+        "stderr, or as JSON to FILE (also EXTRACT_RECIPE_PROFILE=1 or =FILE)",
+    )
+    parser.add_argument(
+        "--profile-patterns",
+        action="store_true",
+        help="With --profile, also time each [skip], [plan], [strip] and "
+        "[redact] pattern on its own (repeats their work)",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Print the project's new prompts as they are appended to "
+        "history.jsonl, until interrupted (markdown or jsonl)",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Keep the history index, parsed prompts and patterns in memory "
+        "and answer extract-recipe-client requests on a Unix socket, "
+        "ingesting lines appended to history.jsonl as they arrive",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help="Socket for --serve and extract-recipe-client (default: "
+        "$XDG_RUNTIME_DIR/extract-recipe.sock)",
+    )
+    return parser
 
-    args = parser.parse_args()
 
+def run(argv: Sequence[str], history: Optional[HotHistory] = None) -> None:
+    """Run the command line argv; exits through SystemExit on errors.
+
+    A --serve server passes the history it keeps in memory, used when
+    the request is for the same Claude directory.
+    """
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.out_dir and not args.all_projects:
+        parser.error("--out-dir requires -a")
+    if args.out_dir and args.o:
+        parser.error("--out-dir and -o cannot be used together")
+    if args.serve and history is not None:
+        parser.error("--serve cannot be sent to a server")
+    if args.follow:
+        if history is not None:
+            parser.error("--follow cannot be sent to a server")
+        if args.all_projects or args.list or args.audit:
+            parser.error("--follow takes a single project, not -a, --list or --audit")
+        if args.output_format == "json":
+            parser.error("--follow writes markdown or jsonl, not json")
+    if history is not None and history.claude_dir != args.claude_dir.resolve():
+        history = None
+
+    if args.serve:
+        from extract_recipe.server import serve
+
+        init_config(args.config)
+        serve(args.claude_dir, args.socket, use_cache=not args.no_cache, prepare=_prepare)
+        return
+
+    profile_target = _profile_target(args.profile, args.profile_patterns)
+    if profile_target is not None:
+        profiling.enable(patterns=args.profile_patterns)
+    try:
+        _extract(parser, args, history)
+    finally:
+        if profile_target is not None:
+            profiling.report(profile_target)
+            profiling.disable()
+
+
+def _extract(
+    parser: argparse.ArgumentParser, args: argparse.Namespace,
+    history: Optional[HotHistory],
+) -> None:
     if args.init_config:
         try:
             dest = init_user_config(args.config)
@@ -175,6 +351,14 @@ def main() -> None:
     # Load pattern config (user config replaces package defaults)
     init_config(args.config)
 
+    if args.check_config:
+        from extract_recipe.configcheck import check_config, format_checks, history_sample
+
+        sample = history_sample(args.claude_dir)
+        checks = check_config(sample)
+        print(format_checks(checks, len(sample)))
+        sys.exit(1 if any(c.verdict != "ok" for c in checks) else 0)
+
     if args.redact and not redact_patterns():
         print(
             "Warning: --redact specified but no [redact] patterns are loaded. "
@@ -182,9 +366,42 @@ def main() -> None:
             file=sys.stderr,
         )
 
-    # Load history
+    paste_cache_dir = args.claude_dir / "paste-cache"
+
+    # Whole-history modes read the file sequentially; everything else goes
+    # through the index and parses only the lines it needs.
+    whole_history = (args.audit and not args.project) or (
+        args.all_projects and not (args.audit or args.list or args.out_dir)
+    )
+    # Without the cache, a project given as a full path (e.g. ".") is read
+    # directly, decoding only lines that mention it; the index is only
+    # built if that finds nothing and the path has to be matched instead.
+    direct: Optional[str] = None
+    if history is None and args.no_cache and args.project and not (args.audit or args.list or args.all_projects or args.follow):
+        candidate = Path(args.project)
+        if candidate.exists():
+            direct = str(candidate.resolve())
     try:
-        entries = load_history(args.claude_dir)
+        if history is not None:
+            with profiling.stage("open_index"):
+                index = history.open()
+            if whole_history:
+                entries = _load(index, args.claude_dir, index.paths(raw=True), args.raw, history)
+        elif whole_history:
+            with profiling.stage("load_history") as span:
+                entries = load_store(args.claude_dir, jobs=args.jobs)
+                span.bytes_in = (args.claude_dir / "history.jsonl").stat().st_size
+            entries = _prepare(entries, args.raw)
+        elif direct is not None:
+            with profiling.stage("load_history") as span:
+                entries = load_history(args.claude_dir, jobs=args.jobs, project=direct)
+                span.bytes_in = (args.claude_dir / "history.jsonl").stat().st_size
+            entries = _prepare(entries, args.raw)
+            if not entries:
+                direct = None
+        if history is None and not whole_history and direct is None:
+            with profiling.stage("open_index"):
+                index = open_index(args.claude_dir, use_cache=not args.no_cache)
     except FileNotFoundError:
         print(
             f"Error: History file not found at {args.claude_dir / 'history.jsonl'}",
@@ -192,50 +409,56 @@ def main() -> None:
         )
         sys.exit(1)
 
-    paste_cache_dir = args.claude_dir / "paste-cache"
-
-    # Filter out housekeeping commands and strip boilerplate (unless --raw)
-    if not args.raw:
-        entries = [e for e in entries if not should_skip(e.display)]
-        for e in entries:
-            e.display = strip_boilerplate(e.display)
-
     if args.audit:
-        target_entries = entries
         if args.project:
-            all_paths = sorted(set(e.project for e in entries))
+            all_paths = index.paths(args.raw)
             matches = _match_projects(args.project, all_paths, args.exact)
-            if matches:
-                target_entries = [e for e in entries if e.project in matches]
-        output = format_audit(target_entries, raw=args.raw)
-        _write_output(output, args.o)
+            entries = _load(index, args.claude_dir, matches or all_paths, args.raw, history)
+        with profiling.stage("format_audit"):
+            output = format_audit(entries, raw=args.raw)
+        write_output(output, args.o)
         return
 
     if args.list:
-        projects = list_projects(entries)
-        output = format_project_list(projects)
+        with profiling.stage("format_list"):
+            source = index if history is None else history
+            projects = source.list_projects(args.raw, get_store(paste_cache_dir).sizes())
+            output = format_project_list(projects)
         if args.redact:
             output = redact(output)
-        _write_output(output, args.o)
+        write_output(output, args.o)
+        return
+
+    cache = None if args.no_cache else RenderCache(cache_dir() / "render")
+
+    if args.all_projects and args.out_dir:
+        written, total = export_dir(
+            args.out_dir, index,
+            lambda projects: _load(index, args.claude_dir, projects, args.raw, history),
+            paste_cache_dir, output_format=args.output_format, raw=args.raw,
+            redact=args.redact, title=args.title, jobs=args.jobs, config=args.config,
+            omit_same_raw=args.omit_same_raw, cache=cache,
+        )
+        _evict(cache)
+        print(f"Wrote {written} of {total} projects to {args.out_dir}", file=sys.stderr)
         return
 
     if args.all_projects:
-        all_paths = sorted(set(e.project for e in entries))
+        # In one JSON document a title would replace every project's path,
+        # so, as ever, only the markdown headings take it
+        title = args.title if args.output_format == "markdown" else None
+        rendered = render_projects(
+            profiling.timed_iter("group_by_session", partition_by_project(entries)),
+            paste_cache_dir,
+            output_format=args.output_format, raw=args.raw, redact=args.redact,
+            title=title, jobs=args.jobs, config=args.config,
+            omit_same_raw=args.omit_same_raw, cache=cache,
+        )
         if args.output_format == "json":
-            projects_sessions = [
-                (p, group_by_session(filter_by_project(entries, p)))
-                for p in all_paths
-            ]
-            output = format_all_json(projects_sessions, paste_cache_dir, raw=args.raw, redact=args.redact)
+            write_output(join_json(rendered), args.o)
         else:
-            parts = []
-            for p in all_paths:
-                sessions = group_by_session(filter_by_project(entries, p))
-                parts.append(format_markdown(p, sessions, paste_cache_dir, raw=args.raw, redact=args.redact, title=args.title))
-            output = "\n".join(parts)
-        if args.redact:
-            output = redact(output)
-        _write_output(output, args.o)
+            write_output(join_blocks(rendered), args.o)
+        _evict(cache)
         return
 
     if args.project is None:
@@ -247,8 +470,13 @@ def main() -> None:
         args.project = str(candidate.resolve())
 
     # Resolve project specifier
-    all_paths = sorted(set(e.project for e in entries))
-    matches = _match_projects(args.project, all_paths, args.exact)
+    if direct is not None:
+        matches = [direct]  # a full path match always wins
+    elif args.follow and candidate.exists():
+        matches = [args.project]  # may have no prompts yet
+    else:
+        all_paths = index.paths(args.raw)
+        matches = _match_projects(args.project, all_paths, args.exact)
 
     if len(matches) == 1:
         project = matches[0]
@@ -279,25 +507,55 @@ def main() -> None:
             )
         sys.exit(1)
 
-    filtered = filter_by_project(entries, project)
-    sessions = group_by_session(filtered)
+    if args.follow:
+        _follow(args, project)
+        return
+
+    if direct is None:
+        entries = _load(index, args.claude_dir, [project], args.raw, history)
+    with profiling.stage("group_by_session"):
+        sessions = group_by_session(entries)
+    if args.jobs > 1:
+        get_store(paste_cache_dir).prefetch(session_hashes(sessions), workers=args.jobs)
 
+    # The formatters redact as they go
     if args.output_format == "json":
-        output = format_json(project, sessions, paste_cache_dir, raw=args.raw, redact=args.redact, title=args.title)
+        chunks = profiling.timed_iter("format_json", iter_json(project, sessions, paste_cache_dir, raw=args.raw, redact=args.redact, title=args.title, omit_same_raw=args.omit_same_raw, cache=cache))
+    elif args.output_format == "jsonl":
+        chunks = _join(profiling.timed_iter("format_jsonl", iter_jsonl(project, sessions, paste_cache_dir, raw=args.raw, redact=args.redact, title=args.title, omit_same_raw=args.omit_same_raw, cache=cache)))
     else:
-        output = format_markdown(project, sessions, paste_cache_dir, raw=args.raw, redact=args.redact, title=args.title)
+        chunks = _join(profiling.timed_iter("format_markdown", iter_markdown(project, sessions, paste_cache_dir, raw=args.raw, redact=args.redact, title=args.title, paste_regions=not args.redact, cache=cache)))
 
-    if args.redact:
-        output = redact(output)
-    _write_output(output, args.o)
+    write_output(chunks, args.o)
+    _evict(cache)
 
 
-def _write_output(output: str, filepath: str) -> None:
-    if filepath:
-        Path(filepath).write_text(output, encoding="utf-8")
-        print(f"Written to {filepath}", file=sys.stderr)
-    else:
-        print(output)
+def _follow(args: argparse.Namespace, project: str) -> None:
+    from extract_recipe.follow import follow
+
+    recipe = LiveRecipe(
+        project, args.claude_dir / "paste-cache", output_format=args.output_format,
+        raw=args.raw, redact=args.redact, title=args.title, omit_same_raw=args.omit_same_raw,
+    )
+    if args.o is None:
+        follow(args.claude_dir, project, recipe, lambda entries: _prepare(entries, args.raw), sys.stdout)
+        return
+    with open(args.o, "w", encoding="utf-8") as f:
+        follow(args.claude_dir, project, recipe, lambda entries: _prepare(entries, args.raw), f)
+
+
+def _evict(cache: Optional[RenderCache]) -> None:
+    if cache is not None:
+        with profiling.stage("evict_cache"):
+            cache.evict()
+
+
+def _join(blocks: Iterable[Chunk], sep: str = "\n") -> Iterator[Chunk]:
+    """Lazily interleave sep between blocks, like sep.join(blocks)."""
+    for i, block in enumerate(blocks):
+        if i:
+            yield sep
+        yield block
 
 
 if __name__ == "__main__":
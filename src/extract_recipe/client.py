@@ -0,0 +1,105 @@
+"""Thin client for extract-recipe --serve (extract-recipe-client).
+
+Takes the same arguments as extract-recipe and has a running server
+execute them: it sends the arguments, its working directory and its
+standard output and error descriptors over the server's Unix socket,
+and the server writes the output straight to those descriptors, so
+pipes, files and terminals behave as with extract-recipe itself.  The
+client then exits with the status the server reports, or is killed by
+SIGPIPE if its output pipe was closed early, as extract-recipe would be.
+
+If no server is listening, the arguments are run in this process
+instead.  Only the standard library is imported until then, so that a
+request costs little more than interpreter start-up.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import signal
+import socket
+import sys
+from typing import List, Optional
+
+# Environment variables that change how a request runs, forwarded to the server
+FORWARDED_ENV = ("EXTRACT_RECIPE_PROFILE",)
+
+
+def default_socket_path() -> str:
+    """Return the socket used when --socket is not given."""
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "extract-recipe.sock")
+    # Like index.cache_dir(), without importing it
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "extract-recipe", "server.sock")
+
+
+def _socket_arg(argv: List[str]) -> Optional[str]:
+    """Return the value of a --socket option in argv, if any."""
+    for i, arg in enumerate(argv):
+        if arg == "--":
+            break
+        if arg == "--socket" and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith("--socket="):
+            return arg[len("--socket="):]
+    return None
+
+
+def request(path: str, argv: List[str]) -> int:
+    """Have the server at path run argv; return its exit status.
+
+    A negative status is a signal that would have ended extract-recipe.
+    Raises FileNotFoundError or ConnectionRefusedError if no server is
+    listening.
+    """
+    message = json.dumps({
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "env": {name: os.environ[name] for name in FORWARDED_ENV if name in os.environ},
+        # So that the server encodes output as this process would
+        "stdout": [sys.stdout.encoding, sys.stdout.errors],
+        "stderr": [sys.stderr.encoding, sys.stderr.errors],
+    }).encode("utf-8")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        reply = b""
+        try:
+            sent = socket.send_fds(sock, [message], [sys.stdout.fileno(), sys.stderr.fileno()])
+            sock.sendall(message[sent:])
+            sock.shutdown(socket.SHUT_WR)
+            while True:
+                data = sock.recv(64)
+                if not data:
+                    break
+                reply += data
+        except OSError:
+            pass
+    try:
+        return int(reply)
+    except ValueError:
+        print("Error: the extract-recipe server closed the connection", file=sys.stderr)
+        return 1
+
+
+def main() -> None:
+    argv = sys.argv[1:]
+    path = _socket_arg(argv) or default_socket_path()
+    try:
+        status = request(path, argv)
+    except (FileNotFoundError, ConnectionRefusedError):
+        # No server: do the work here
+        from extract_recipe.cli import main as cli_main
+
+        cli_main()
+        return
+    if status < 0:
+        signal.signal(-status, signal.SIG_DFL)
+        os.kill(os.getpid(), -status)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
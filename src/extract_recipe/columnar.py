@@ -0,0 +1,207 @@
+"""Compact columnar storage for whole-history runs.
+
+load_history() returns one PromptEntry (plus a dict of PasteRefs) per
+line, with every project path and session id held as a separate string.
+For -a and --audit over a large history that dominates resident memory.
+EntryStore keeps the same data in columns instead:
+
+  - timestamps in an array('q'), or a list if a line has a timestamp
+    that is not an integer (such as a float), kept as it was recorded
+  - project paths and session ids interned into tables, referenced by
+    integer codes in array('i') columns
+  - prompt text as UTF-8 in one shared bytearray, decoded on access
+  - paste references only for the (few) entries that have them
+
+It behaves as a read-only Sequence[PromptEntry], creating entries on
+access, so group_by_session(), filter_by_project() and the formatters
+accept it in place of a list.  Filtering and display transforms return
+views that share the underlying columns.
+"""
+
+from __future__ import annotations
+
+from array import array
+from pathlib import Path
+from typing import (
+    Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union,
+)
+
+from extract_recipe.history import PasteRef, PromptEntry, iter_history, load_history
+
+_NO_SESSION = -1
+
+# (key, id, type, content_hash) for each paste reference of an entry
+_PasteRow = Tuple[Tuple[str, Optional[int], Optional[str], Optional[str]], ...]
+
+
+class _Columns:
+    """The shared columns behind an EntryStore and all its views."""
+
+    def __init__(self) -> None:
+        self.timestamps: Union[array, List[int]] = array("q")
+        self.projects = array("i")
+        self.sessions = array("i")
+        self.text = bytearray()
+        self.text_ends = array("q")
+        self.pastes: Dict[int, _PasteRow] = {}
+        self.project_names: List[str] = []
+        self.project_codes: Dict[str, int] = {}
+        self.session_names: List[str] = []
+        self.session_codes: Dict[str, int] = {}
+
+    def append(self, entry: PromptEntry) -> None:
+        row = len(self.timestamps)
+        try:
+            self.timestamps.append(entry.timestamp)
+        except (TypeError, OverflowError):
+            # Not a 64-bit integer; keep it as is, like load_history()
+            self.timestamps = list(self.timestamps)
+            self.timestamps.append(entry.timestamp)
+        self.projects.append(self._code(
+            entry.project, self.project_names, self.project_codes
+        ))
+        if entry.session_id is None:
+            self.sessions.append(_NO_SESSION)
+        else:
+            self.sessions.append(self._code(
+                entry.session_id, self.session_names, self.session_codes
+            ))
+        self.text += entry.display.encode("utf-8", "surrogatepass")
+        self.text_ends.append(len(self.text))
+        if entry.pasted_contents:
+            self.pastes[row] = tuple(
+                (key, ref.id, ref.type, ref.content_hash)
+                for key, ref in entry.pasted_contents.items()
+            )
+
+    @staticmethod
+    def _code(value: str, names: List[str], codes: Dict[str, int]) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def display(self, row: int) -> str:
+        start = self.text_ends[row - 1] if row else 0
+        return self.text[start:self.text_ends[row]].decode("utf-8", "surrogatepass")
+
+
+class EntryStore(Sequence[PromptEntry]):
+    """Read-only sequence of PromptEntry backed by shared columns."""
+
+    def __init__(
+        self,
+        columns: Optional[_Columns] = None,
+        rows: Optional[array] = None,
+        transform: Optional[Callable[[str], str]] = None,
+    ) -> None:
+        self._columns = columns if columns is not None else _Columns()
+        self._rows = rows  # None means every row, in storage order
+        self._transform = transform
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[PromptEntry]) -> "EntryStore":
+        """Build a store holding entries, in the given order."""
+        store = cls()
+        for entry in entries:
+            store._columns.append(entry)
+        return store
+
+    def __len__(self) -> int:
+        if self._rows is None:
+            return len(self._columns.timestamps)
+        return len(self._rows)
+
+    def _entry(self, row: int) -> PromptEntry:
+        c = self._columns
+        display = c.display(row)
+        if self._transform is not None:
+            display = self._transform(display)
+        session = c.sessions[row]
+        return PromptEntry(
+            display=display,
+            pasted_contents={
+                key: PasteRef(id=pid, type=ptype, content_hash=phash)
+                for key, pid, ptype, phash in c.pastes.get(row, ())
+            },
+            timestamp=c.timestamps[row],
+            project=c.project_names[c.projects[row]],
+            session_id=None if session == _NO_SESSION else c.session_names[session],
+        )
+
+    def __getitem__(self, i: Union[int, slice]):  # type: ignore[override]
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("EntryStore index out of range")
+        return self._entry(i if self._rows is None else self._rows[i])
+
+    def __iter__(self) -> Iterator[PromptEntry]:
+        for row in self._all_rows():
+            yield self._entry(row)
+
+    def _view(self, rows: Iterable[int]) -> "EntryStore":
+        return EntryStore(self._columns, array("q", rows), self._transform)
+
+    def _all_rows(self) -> Iterable[int]:
+        return range(len(self._columns.timestamps)) if self._rows is None else self._rows
+
+    def sorted_by_timestamp(self) -> "EntryStore":
+        """Return a view ordered by timestamp (ties keep current order)."""
+        ts = self._columns.timestamps
+        return self._view(sorted(self._all_rows(), key=ts.__getitem__))
+
+    def projects(self) -> List[str]:
+        """Return the sorted distinct project paths in this view."""
+        c = self._columns
+        codes = set(c.projects[row] for row in self._all_rows())
+        return sorted(c.project_names[code] for code in codes)
+
+    def filter_by_project(self, project: str) -> "EntryStore":
+        """Return a view of the entries for one project."""
+        c = self._columns
+        code = c.project_codes.get(project)
+        return self._view(row for row in self._all_rows() if c.projects[row] == code)
+
+    def split_by_project(self) -> List[Tuple[str, "EntryStore"]]:
+        """Return (project, view) pairs sorted by path, in one pass."""
+        c = self._columns
+        rows_by_code: Dict[int, array] = {}
+        for row in self._all_rows():
+            code = c.projects[row]
+            rows = rows_by_code.get(code)
+            if rows is None:
+                rows = rows_by_code[code] = array("q")
+            rows.append(row)
+        return sorted(
+            (c.project_names[code], EntryStore(c, rows, self._transform))
+            for code, rows in rows_by_code.items()
+        )
+
+    def filter_display(self, predicate: Callable[[str], bool]) -> "EntryStore":
+        """Return a view of the entries whose (transformed) display passes."""
+        c = self._columns
+        transform = self._transform or (lambda text: text)
+        return self._view(
+            row for row in self._all_rows() if predicate(transform(c.display(row)))
+        )
+
+    def map_display(self, fn: Callable[[str], str]) -> "EntryStore":
+        """Return a view whose display text is passed through fn on access."""
+        inner = self._transform
+        transform = fn if inner is None else (lambda text: fn(inner(text)))
+        return EntryStore(self._columns, self._rows, transform)
+
+
+def load_store(claude_dir: Path, jobs: int = 1) -> EntryStore:
+    """Like load_history(), but return a compact EntryStore.
+
+    The serial path fills the columns as lines are parsed, so only one
+    PromptEntry is alive at a time.
+    """
+    if jobs > 1:
+        return EntryStore.from_entries(load_history(claude_dir, jobs=jobs))
+    return EntryStore.from_entries(iter_history(claude_dir)).sorted_by_timestamp()
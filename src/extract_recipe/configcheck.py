@@ -0,0 +1,338 @@
+"""Find patterns in the config whose cost could stall a run (--check-config).
+
+re backtracks, so a pattern can take time quadratic (or worse) in the
+length of the text it is run on.  The [strip] rule
+
+    \\n*[^\\n]*\\.claude/projects/[^\\n]*\\.jsonl
+
+is one (the shipped default is written to avoid it): on a long line
+containing .claude/projects/ but no .jsonl after it, every starting
+position scans to the end of the line.  Prompts with pastes can be
+megabytes long, so one such pattern can dominate a run.
+
+For each pattern, check_config():
+
+  - compiles it, reporting errors instead of failing
+  - runs it (searching, or substituting for [strip] and [redact]) on
+    synthetic texts of growing length: prose on one line or many, the
+    pattern's required literal repeated, runs of one character, and the
+    longest prompt in the history sample
+  - estimates how its time grows with length, as the exponent k of
+    time ~ length^k between the two longest texts that took measurable
+    time, and flags k >= SUPERLINEAR
+  - stops a pattern at TIMEOUT seconds (where signal.setitimer exists),
+    so a catastrophically backtracking pattern is reported, not waited on
+  - times it over a sample of the user's history, flagging any prompt
+    that took longer than SLOW_CALL seconds
+
+A pattern with a (?#max-input=N) limit is only tried on texts of up to
+N characters, as at run time, and is not flagged for its growth if it
+stays under SLOW_CALL seconds at N.  Flagged patterns come with the
+limit at which they would, except in [redact], where a limit would
+leave long texts unredacted and is not allowed.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import random
+import re
+import signal
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from extract_recipe.boilerplate import max_input, pattern_sources, required_literal
+from extract_recipe.history import iter_history
+
+# Lengths of the synthetic texts, each tried while the last took < STEP_BUDGET
+LENGTHS = (1_000, 4_000, 16_000, 64_000, 256_000)
+STEP_BUDGET = 0.25
+
+# Growth exponent from which a pattern is flagged
+SUPERLINEAR = 1.5
+
+# Times below this are too noisy to estimate growth from
+_MIN_TIME = 0.002
+
+# Seconds allowed per pattern for the synthetic texts
+TIMEOUT = 5.0
+
+# A single history prompt taking longer than this is flagged
+SLOW_CALL = 0.1
+
+# History prompts timed: the longest ones plus a random sample
+_LONGEST = 50
+_SAMPLE = 2000
+
+# Sections whose patterns are substituted rather than searched
+_SUBSTITUTED = {"strip", "redact"}
+
+# Sections whose patterns are matched against single words
+_WORD_SECTIONS = {"audit-stopwords"}
+
+_PROSE = "the parser should handle nested sessions and write output files "
+
+
+@dataclass
+class PatternCheck:
+    section: str
+    pattern: str
+    error: Optional[str] = None
+    max_input: Optional[int] = None
+    growth: Optional[float] = None  # exponent k of time ~ length^k
+    worst_input: str = ""  # the synthetic text that took longest
+    worst_length: int = 0
+    worst_seconds: float = 0.0
+    timed_out: bool = False
+    history_seconds: float = 0.0
+    history_slowest: float = 0.0
+    timings: Dict[str, List[Tuple[int, float]]] = field(default_factory=dict)
+
+    @property
+    def verdict(self) -> str:
+        if self.error is not None:
+            return "error"
+        if self.timed_out:
+            return "timeout"
+        # A limit that keeps the slowest text fast enough makes growth harmless
+        bounded = self.max_input is not None and self.worst_seconds <= SLOW_CALL
+        if self.growth is not None and self.growth >= SUPERLINEAR and not bounded:
+            return "superlinear"
+        if self.history_slowest > SLOW_CALL:
+            return "slow"
+        return "ok"
+
+    def suggested_max_input(self) -> Optional[int]:
+        """Return the length at which the measured growth reaches SLOW_CALL.
+
+        This is the smallest over the synthetic texts on which the
+        pattern grew superlinearly, rounded down to a thousand.
+        """
+        limits = []
+        for timings in self.timings.values():
+            growth = _growth(timings)
+            if growth is not None and growth[0] >= SUPERLINEAR:
+                k, length, seconds = growth
+                limits.append(length * (SLOW_CALL / seconds) ** (1 / k))
+        if not limits:
+            return None
+        return max(1000, int(min(limits)) // 1000 * 1000)
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame) -> None:
+    raise _Timeout()
+
+
+def _inputs(literal: Optional[str], longest_prompt: str) -> Dict[str, Callable[[int], str]]:
+    """Return {name: function building a text of a given length}.
+
+    Each text ends with the pattern's required literal, if it has one,
+    since texts without it are not searched at run time.
+    """
+    tail = literal or ""
+
+    def repeat(unit: str, end: str = "") -> Callable[[int], str]:
+        end += tail
+        return lambda n: (unit * (n // len(unit) + 1))[:max(0, n - len(end))] + end
+
+    inputs = {
+        "prose, one line": repeat(_PROSE),
+        "prose, short lines": repeat(_PROSE.strip() + "\n"),
+        "spaces": repeat(" "),
+        "newlines": repeat("\n"),
+        "slashes": repeat("/"),
+        "letters": repeat("a"),
+        "letters, then !": repeat("a", "!"),
+    }
+    if literal:
+        inputs["literal repeated"] = repeat(literal + " x ")
+    if longest_prompt:
+        inputs["longest prompt"] = repeat(longest_prompt)
+    return inputs
+
+
+def _runner(pattern: re.Pattern, section: str) -> Callable[[str], object]:
+    if section in _SUBSTITUTED:
+        return lambda text: pattern.sub("", text)
+    if section in _WORD_SECTIONS:
+        return pattern.fullmatch
+    return pattern.search
+
+
+def _growth(timings: List[Tuple[int, float]]) -> Optional[Tuple[float, int, float]]:
+    """Return (exponent, length, seconds) from the two longest measurable timings."""
+    usable = [(n, t) for n, t in timings if t >= _MIN_TIME]
+    if len(usable) < 2:
+        return None
+    (n1, t1), (n2, t2) = usable[-2], usable[-1]
+    return math.log(t2 / t1) / math.log(n2 / n1), n2, t2
+
+
+def _time_synthetic(
+    check: PatternCheck, run: Callable[[str], object],
+    inputs: Dict[str, Callable[[int], str]], timeout: float,
+) -> None:
+    limit = check.max_input
+    lengths = sorted({min(n, limit) for n in LENGTHS}) if limit is not None else LENGTHS
+    deadline = time.perf_counter() + timeout
+    for name, make in inputs.items():
+        timings = check.timings[name] = []
+        try:
+            for n in lengths:
+                text = make(n)
+                start = time.perf_counter()
+                try:
+                    run(text)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    timings.append((n, elapsed))
+                    if elapsed > check.worst_seconds:
+                        check.worst_input, check.worst_length = name, n
+                        check.worst_seconds = elapsed
+                if elapsed > STEP_BUDGET or time.perf_counter() > deadline:
+                    break
+        finally:
+            # Also on a timeout, whose partial timing is a lower bound
+            growth = _growth(timings)
+            if growth is not None and (check.growth is None or growth[0] > check.growth):
+                check.growth = growth[0]
+
+
+def _check_pattern(
+    check: PatternCheck, pattern: re.Pattern, history: Sequence[str],
+    longest_prompt: str, timeout: float,
+) -> None:
+    run = _runner(pattern, check.section)
+    check.max_input = max_input(pattern)
+    literal = required_literal(pattern)
+    inputs = _inputs(literal, longest_prompt)
+    use_timer = hasattr(signal, "setitimer")
+    if use_timer:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        _time_synthetic(check, run, inputs, timeout)
+    except _Timeout:
+        check.timed_out = True
+    finally:
+        if use_timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+    if check.timed_out:
+        return  # the history sample could stall just the same
+    # Substitutions are skipped at run time for texts without the literal
+    guarded = literal if check.section in _SUBSTITUTED else None
+    for text in history:
+        if check.max_input is not None and len(text) > check.max_input:
+            continue
+        if guarded is not None and guarded not in text:
+            continue
+        start = time.perf_counter()
+        run(text)
+        elapsed = time.perf_counter() - start
+        check.history_seconds += elapsed
+        check.history_slowest = max(check.history_slowest, elapsed)
+
+
+def history_sample(claude_dir: Path, size: int = _SAMPLE, seed: int = 0) -> List[str]:
+    """Return the longest prompts of a history plus a random sample.
+
+    Returns an empty list if there is no history.
+    """
+    rng = random.Random(seed)
+    sample: List[str] = []
+    longest: List[Tuple[int, int, str]] = []  # heap of (length, i, display)
+    try:
+        for i, entry in enumerate(iter_history(claude_dir)):
+            text = entry.display
+            # Reservoir sampling keeps memory bounded for large histories
+            if len(sample) < size:
+                sample.append(text)
+            else:
+                j = rng.randrange(i + 1)
+                if j < size:
+                    sample[j] = text
+            if len(longest) < _LONGEST:
+                heapq.heappush(longest, (len(text), i, text))
+            elif len(text) > longest[0][0]:
+                heapq.heappushpop(longest, (len(text), i, text))
+    except OSError:
+        return []
+    return [text for _, _, text in sorted(longest, reverse=True)] + sample
+
+
+def check_config(
+    history: Sequence[str] = (), timeout: float = TIMEOUT
+) -> List[PatternCheck]:
+    """Check every pattern of the loaded config; see the module docstring.
+
+    history is a sample of prompts, as returned by history_sample().
+    """
+    longest_prompt = max(history, key=len) if history else ""
+    checks = []
+    for section, source, flags in pattern_sources():
+        check = PatternCheck(section, source)
+        checks.append(check)
+        try:
+            pattern = re.compile(source, flags)
+        except re.error as e:
+            check.error = str(e)
+            continue
+        words = section in _WORD_SECTIONS
+        _check_pattern(
+            check, pattern, () if words else history, longest_prompt, timeout
+        )
+    return checks
+
+
+def format_checks(
+    checks: List[PatternCheck], history_size: int, timeout: float = TIMEOUT
+) -> str:
+    """Return a report of the flagged patterns, worst first."""
+    order = {"error": 0, "timeout": 1, "superlinear": 2, "slow": 3}
+    flagged = sorted((c for c in checks if c.verdict != "ok"), key=lambda c: order[c.verdict])
+    sections = len({c.section for c in checks})
+    summary = (
+        f"{len(checks)} patterns in {sections} sections checked against synthetic texts"
+        + (f" and {history_size} history prompts" if history_size else "")
+        + f"; {len(flagged)} flagged."
+    )
+    if not flagged:
+        return summary
+    lines = [
+        "Verdict      Section          Growth  Worst synthetic input                History (slowest)"
+        "  Max input  Pattern",
+        "-----------  ---------------  ------  -----------------------------------  -----------------"
+        "  ---------  -------",
+    ]
+    for c in flagged:
+        if c.error is not None:
+            lines.append(f"{'error':<11}  {c.section:<15}  {'':>6}  {c.error:<56}  {'':>9}  {c.pattern}")
+            continue
+        growth = f"n^{c.growth:.1f}" if c.growth is not None else "-"
+        worst = f"{c.worst_seconds:.3f}s at {c.worst_length} ({c.worst_input})"
+        if c.timed_out:
+            worst = "> " + worst
+        slowest = f"{c.history_slowest:.4f}s" if history_size else "-"
+        cap = None if c.section == "redact" else c.suggested_max_input()
+        lines.append(
+            f"{c.verdict:<11}  {c.section:<15}  {growth:>6}  {worst:<35}  {slowest:<17}"
+            f"  {cap or '-':>9}  {c.pattern}"
+        )
+    lines.append("")
+    lines.append(summary)
+    if any(c.error is None for c in flagged):
+        lines.append(
+            "Rewrite flagged patterns, or start them (except in [redact]) with "
+            "(?#max-input=N) to apply them only to texts of up to N characters; "
+            f"Max input is the length at which the measured growth reaches {SLOW_CALL:g}s per text."
+        )
+    return "\n".join(lines)
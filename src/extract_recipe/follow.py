@@ -0,0 +1,201 @@
+"""Print a project's prompts as they are appended to history.jsonl (--follow).
+
+follow() starts at the current end of the history file, like tail -f,
+and waits on a Watcher (see watch.py), so it uses no CPU while nothing
+is written and picks up a new line within moments of it being appended.
+Each new line goes through the same steps as a one-shot run: the cheap
+project_filter() test, parsing, the [skip] and [strip] patterns, and
+then [plan] collapsing and [redact] as the LiveRecipe renders it.
+
+Claude Code may write a paste's cache file just after the history line
+that references it, so a prompt whose paste files are not there yet is
+held back (with the prompts after it, to keep them in order) until they
+appear, or for PASTE_WAIT seconds, after which it is printed with the
+usual "cache file missing" note.
+
+If history.jsonl is truncated or replaced, following carries on from
+the end of the new file, as for a file that has just been opened.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO, Callable, Deque, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from extract_recipe.formatter import LiveRecipe
+from extract_recipe.history import (
+    MALFORMED_ERRORS,
+    PromptEntry,
+    parse_entry,
+    project_filter,
+    warn_malformed,
+)
+from extract_recipe.output import write_blocks
+from extract_recipe.paste import get_store
+from extract_recipe.watch import Watcher
+
+# Seconds to hold back a prompt whose paste-cache files have not appeared
+PASTE_WAIT = 10.0
+
+
+class _Tail:
+    """Complete lines appended to a file since it was last read."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file: Optional[BinaryIO] = None
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._open(at_end=True)
+
+    def _open(self, at_end: bool) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        self._file = f
+        self._inode = os.fstat(f.fileno()).st_ino
+        self._offset = 0
+        if at_end:
+            size = f.seek(0, os.SEEK_END)
+            self._offset = _line_start(f, size)
+            f.seek(self._offset)
+            try:
+                parse_entry(f.read())
+                self._offset = size  # complete, though unterminated
+            except MALFORMED_ERRORS:
+                pass
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def lines(self) -> Iterator[bytes]:
+        """Yield the non-blank lines appended since the last call.
+
+        An unterminated final line is only yielded once it parses, so a
+        line caught half-written is picked up whole next time.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if self._file is None:
+            # Created after following began: all of it is new
+            self._open(at_end=False)
+        elif st.st_ino != self._inode or st.st_size < self._offset:
+            print(
+                f"Warning: {self.path} was rewritten; following from its new end",
+                file=sys.stderr,
+            )
+            self._open(at_end=True)
+        if self._file is None:
+            return
+        self._file.seek(self._offset)
+        data = self._file.read()
+        end = data.rfind(b"\n") + 1
+        tail = data[end:]
+        if tail.strip():
+            try:
+                parse_entry(tail)
+            except MALFORMED_ERRORS:
+                tail = b""
+        self._offset += end + len(tail)
+        for line in data[:end].split(b"\n"):
+            if line.strip():
+                yield line
+        if tail.strip():
+            yield tail
+
+
+def _line_start(f: BinaryIO, size: int) -> int:
+    """Return where the line that ends the first size bytes of f starts.
+
+    That is size itself if the file ends with a newline; otherwise the
+    start of its unterminated last line, which may still be being written.
+    """
+    pos = size
+    while pos > 0:
+        start = max(0, pos - 65536)
+        f.seek(start)
+        block = f.read(pos - start)
+        if pos == size and block.endswith(b"\n"):
+            return size
+        newline = block.rfind(b"\n")
+        if newline >= 0:
+            return start + newline + 1
+        pos = start
+    return 0
+
+
+def follow(
+    claude_dir: Path,
+    project: str,
+    recipe: LiveRecipe,
+    prepare: Callable[[List[PromptEntry]], Sequence[PromptEntry]],
+    out: TextIO,
+) -> None:
+    """Write project's new prompts to out as they arrive, until interrupted.
+
+    prepare(entries) applies skip and strip, dropping skipped entries.
+    """
+    history_file = claude_dir / "history.jsonl"
+    paste_cache_dir = claude_dir / "paste-cache"
+    store = get_store(paste_cache_dir)
+    may_match = project_filter(project)
+    # Prepared entries waiting for their pastes, with when to stop waiting
+    pending: Deque[Tuple[PromptEntry, float]] = deque()
+
+    def missing(entry: PromptEntry) -> bool:
+        sizes = store.sizes()
+        return any(
+            ref.content_hash is not None and ref.content_hash not in sizes
+            for ref in entry.pasted_contents.values()
+        )
+
+    write_blocks(out, recipe.header())
+    # Watch before finding the end, so that no append is missed
+    watcher = Watcher([history_file, paste_cache_dir])
+    tail = _Tail(history_file)
+    try:
+        while True:
+            entries = []
+            for line in tail.lines():
+                if not may_match(line):
+                    continue
+                try:
+                    entry = parse_entry(line)
+                except MALFORMED_ERRORS as e:
+                    warn_malformed(e)
+                    continue
+                if entry.project == project:
+                    entries.append(entry)
+            prepared = prepare(entries)
+            if any(missing(entry) for entry in prepared):
+                store.refresh()  # the paste may have been written just before
+            deadline = time.monotonic() + PASTE_WAIT
+            pending.extend((entry, deadline) for entry in prepared)
+
+            blocks = []
+            now = time.monotonic()
+            while pending and (now >= pending[0][1] or not missing(pending[0][0])):
+                blocks.extend(recipe.render(pending.popleft()[0]))
+            if blocks:
+                write_blocks(out, blocks)
+
+            timeout = max(0.0, pending[0][1] - now) if pending else None
+            if paste_cache_dir in watcher.wait(timeout):
+                store.refresh()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        tail.close()
@@ -3,18 +3,18 @@ from __future__ import annotations
 import json
 import re
 from collections import Counter
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional, Tuple
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from extract_recipe.boilerplate import audit_stopwords, is_plan
-from extract_recipe.history import PromptEntry, Session
-from extract_recipe.paste import resolve_pastes
-
-# Context-break commands: /clear, /compact, /compress
-_CONTEXT_BREAK_RE = re.compile(
-    r"^/(clear|compact|compress)\s*(.*?)\s*$", re.DOTALL
-)
+from extract_recipe.boilerplate import is_audit_stopword, is_plan
+from extract_recipe.history import CONTEXT_BREAK_RE, ProjectStats, PromptEntry, Session
+from extract_recipe.output import Chunk
+from extract_recipe.paste import get_store, resolve_paste_regions, resolve_pastes
+from extract_recipe.redact import redact as redact_text
+from extract_recipe.rendercache import RenderCache
 
 # First markdown heading in a plan prompt
 _PLAN_TITLE_RE = re.compile(r"^#\s+(.+)$", re.MULTILINE)
@@ -25,7 +25,7 @@ def _context_break(entry: PromptEntry) -> Optional[Tuple[str, str]]:
 
     Returns None for regular prompts.
     """
-    m = _CONTEXT_BREAK_RE.match(entry.display)
+    m = CONTEXT_BREAK_RE.match(entry.display)
     if m:
         return m.group(1), m.group(2)
     return None
@@ -57,151 +57,350 @@ def _format_timestamp(ts: int, raw: bool = False) -> str:
     return s
 
 
-def _session_label(session: Session, index: int) -> str:
+def _session_label(session: Session) -> str:
     if session.session_id is None:
         return "Session (no ID)"
     return f"Session {session.session_id[:8]}"
 
 
-def format_markdown(
+def _keep(text: str) -> str:
+    return text
+
+
+@dataclass
+class _Numbering:
+    """Session and prompt numbers of redacted output, as prompts are rendered.
+
+    A context break moves to a new session number: the next one, or one
+    from allocate if given.
+    """
+    session: int
+    prompt: int = 0
+    allocate: Optional[Callable[[], int]] = None
+
+    def context_break(self) -> None:
+        self.session = self.allocate() if self.allocate is not None else self.session + 1
+        self.prompt = 0
+
+
+def _sessions_numbered(
+    sessions: Iterable[Session],
+    render: Callable[[Session, int], Iterable[Chunk]],
+    paste_cache_dir: Path,
+    redact: bool,
+    cache: Optional[RenderCache],
+    options: Tuple[object, ...],
+) -> Iterator[Iterable[Chunk]]:
+    """Yield render(session, number) for each session, through cache if given.
+
+    number is the session's number in redacted output, where every
+    session and every context break starts a new one.  A session's
+    chunks depend on nothing else, so with a cache each is read back if
+    it was rendered before with the same options and contents.
+    """
+    if cache is not None:
+        common = cache.options(*options)
+        sizes = get_store(paste_cache_dir).sizes()
+    number = 1
+    for session in sessions:
+        if cache is None:
+            yield render(session, number)
+        else:
+            key = cache.key(common, session, number if redact else 0, sizes)
+            yield cache.cached(key, partial(render, session, number))
+        if redact:
+            number += 1 + sum(1 for e in session.prompts if _context_break(e) is not None)
+
+
+def iter_markdown(
     project: str,
-    sessions: List[Session],
+    sessions: Iterable[Session],
     paste_cache_dir: Path,
     raw: bool = False,
     redact: bool = False,
     title: Optional[str] = None,
-) -> str:
-    """Format sessions as a markdown document."""
-    lines: List[str] = []
+    paste_regions: bool = False,
+    cache: Optional[RenderCache] = None,
+) -> Iterator[Chunk]:
+    """Yield the blocks of a markdown document, to be joined with newlines.
+
+    Each heading, marker and prompt is a separate block, so output can be
+    written as it is produced.  With redact, every block is redacted.
+    With paste_regions=True, a prompt with large pastes is yielded as a
+    list of strings and PasteRegions for output.write_output() to splice
+    in.  With a cache, unchanged sessions are read back from it.
+    """
+    clean = redact_text if redact else _keep
     prefix = "Recipe (redacted)" if redact else "Recipe"
-    lines.append(f"# {title}\n" if title else f"# {prefix}: {project}\n")
+    yield clean(f"# {title}\n" if title else f"# {prefix}: {project}\n")
+
+    def render(session: Session, number: int) -> Iterable[Chunk]:
+        blocks = _markdown_session(session, number, paste_cache_dir, raw, redact, paste_regions)
+        return map(redact_text, blocks) if redact else blocks
+
+    options = ("markdown", raw, redact, paste_regions, paste_cache_dir)
+    for blocks in _sessions_numbered(sessions, render, paste_cache_dir, redact, cache, options):
+        yield from blocks
+
+
+def _markdown_session(
+    session: Session,
+    display_session: int,
+    paste_cache_dir: Path,
+    raw: bool,
+    redact: bool,
+    paste_regions: bool,
+) -> Iterator[Chunk]:
+    """Yield the (unredacted) blocks of one session, numbered display_session."""
+    if redact:
+        yield f"## Session {display_session}\n"
+    else:
+        yield f"## {_session_label(session)}\n"
 
-    display_session = 0
+    numbering = _Numbering(display_session)
+    for entry in session.prompts:
+        yield from _markdown_entry(entry, numbering, paste_cache_dir, raw, redact, paste_regions)
 
-    for si, session in enumerate(sessions):
-        display_session += 1
+
+def _markdown_entry(
+    entry: PromptEntry,
+    numbering: _Numbering,
+    paste_cache_dir: Path,
+    raw: bool,
+    redact: bool,
+    paste_regions: bool,
+) -> Iterator[Chunk]:
+    """Yield the (unredacted) blocks of one entry, advancing numbering."""
+    cb = _context_break(entry)
+    if cb is not None:
+        command, comment = cb
         if redact:
-            lines.append(f"## Session {display_session}\n")
+            numbering.context_break()
+            if comment:
+                yield f"## Session {numbering.session} (context {command}ed: {comment})\n"
+            else:
+                yield f"## Session {numbering.session} (context {command}ed)\n"
         else:
-            lines.append(f"## {_session_label(session, si)}\n")
-
-        prompt_num = 0
-        for entry in session.prompts:
-            cb = _context_break(entry)
-            if cb is not None:
-                command, comment = cb
-                if redact:
-                    display_session += 1
-                    prompt_num = 0
-                    if comment:
-                        lines.append(f"## Session {display_session} (context {command}ed: {comment})\n")
-                    else:
-                        lines.append(f"## Session {display_session} (context {command}ed)\n")
-                else:
-                    if comment:
-                        lines.append(f"*\u2014 Context {command}ed: {comment} \u2014*\n")
-                    else:
-                        lines.append(f"*\u2014 Context {command}ed \u2014*\n")
-                continue
-
-            prompt_num += 1
-            title = _plan_title(entry)
-            if title is not None and not raw:
-                if redact:
-                    lines.append(f"### Prompt {display_session}.{prompt_num}\n")
-                else:
-                    date_str = _format_timestamp(entry.timestamp, raw=raw)
-                    lines.append(f"### {date_str}\n")
-                lines.append(f"*\u2014 Plan: {title} \u2014*\n")
-                continue
-
-            if redact:
-                lines.append(f"### Prompt {display_session}.{prompt_num}\n")
+            if comment:
+                yield f"*\u2014 Context {command}ed: {comment} \u2014*\n"
             else:
-                date_str = _format_timestamp(entry.timestamp, raw=raw)
-                lines.append(f"### {date_str}\n")
-            resolved = resolve_pastes(entry, paste_cache_dir)
-            lines.append(resolved)
-            lines.append("")
+                yield f"*\u2014 Context {command}ed \u2014*\n"
+        return
 
-    return "\n".join(lines)
+    numbering.prompt += 1
+    if redact:
+        yield f"### Prompt {numbering.session}.{numbering.prompt}\n"
+    else:
+        date_str = _format_timestamp(entry.timestamp, raw=raw)
+        yield f"### {date_str}\n"
+    title = _plan_title(entry)
+    if title is not None and not raw:
+        yield f"*\u2014 Plan: {title} \u2014*\n"
+        return
+    if paste_regions:
+        yield resolve_paste_regions(entry, paste_cache_dir)
+    else:
+        yield resolve_pastes(entry, paste_cache_dir)
+    yield ""
 
 
-def _project_json(
+def format_markdown(
     project: str,
     sessions: List[Session],
     paste_cache_dir: Path,
     raw: bool = False,
     redact: bool = False,
     title: Optional[str] = None,
-) -> dict:
-    """Build the JSON-serialisable dict for one project."""
-    data = {
-        "project": title or project,
-        "sessions": [],
-    }
-    display_session = 0
+    cache: Optional[RenderCache] = None,
+) -> str:
+    """Format sessions as a markdown document."""
+    return "\n".join(iter_markdown(
+        project, sessions, paste_cache_dir, raw=raw, redact=redact, title=title,
+        cache=cache,
+    ))
 
-    for si, session in enumerate(sessions):
-        display_session += 1
-        session_data: dict = {
-            "session_id": display_session if redact else session.session_id,
-            "prompts": [],
-        }
-        prompt_num = 0
-        for entry in session.prompts:
-            cb = _context_break(entry)
-            if cb is not None:
-                command, comment = cb
-                if redact:
-                    data["sessions"].append(session_data)
-                    display_session += 1
-                    prompt_num = 0
-                    session_data = {
-                        "session_id": display_session,
-                        "context_break": command,
-                        "prompts": [],
-                    }
-                    if comment:
-                        session_data["context_break_comment"] = comment
-                else:
-                    item: dict = {
-                        "type": "context_break",
-                        "command": command,
-                        "date": _format_timestamp(entry.timestamp),
-                    }
-                    if raw:
-                        item["timestamp_ms"] = entry.timestamp
-                    if comment:
-                        item["comment"] = comment
-                    session_data["prompts"].append(item)
-                continue
-
-            prompt_num += 1
-            title = _plan_title(entry)
-            if title is not None and not raw:
-                item = {
-                    "type": "plan",
-                    "title": title,
-                }
-                if not redact:
-                    item["date"] = _format_timestamp(entry.timestamp)
-                session_data["prompts"].append(item)
-                continue
-
-            resolved = resolve_pastes(entry, paste_cache_dir)
-            item = {
-                "type": "prompt",
-                "display_raw": entry.display,
-                "display_resolved": resolved,
+
+# Events produced by _session_events(): a session starts, with the
+# keys that precede and follow its "prompts" array, or a prompt item
+_SessionEvent = Tuple[str, dict, dict]
+_PromptEvent = Tuple[str, dict, None]
+
+
+def _session_events(
+    session: Session,
+    display_session: int,
+    paste_cache_dir: Path,
+    raw: bool = False,
+    redact: bool = False,
+    omit_same_raw: bool = False,
+) -> Iterator[Union[_SessionEvent, _PromptEvent]]:
+    """Yield the JSON structure of one output session as a flat stream.
+
+    ("session", head, tail) starts a session object whose keys are head,
+    then "prompts", then tail; ("prompt", item, None) is the next entry
+    of the current session's prompts.  The first event starts a session,
+    numbered display_session with redact; with redact each context break
+    starts another.  Each prompt is resolved only when it is reached.
+
+    With redact, string values are redacted here, before serialisation,
+    so patterns see the text itself rather than its JSON escaping, and a
+    prompt without pastes is redacted once for both of its fields.  With
+    omit_same_raw, display_raw is left out when it equals
+    display_resolved.
+    """
+    yield "session", {"session_id": display_session if redact else session.session_id}, {}
+    numbering = _Numbering(display_session)
+    for entry in session.prompts:
+        yield from _entry_events(entry, numbering, paste_cache_dir, raw, redact, omit_same_raw)
+
+
+def _entry_events(
+    entry: PromptEntry,
+    numbering: _Numbering,
+    paste_cache_dir: Path,
+    raw: bool,
+    redact: bool,
+    omit_same_raw: bool,
+) -> Iterator[Union[_SessionEvent, _PromptEvent]]:
+    """Yield the _session_events() of one entry, advancing numbering."""
+    clean = redact_text if redact else _keep
+    cb = _context_break(entry)
+    if cb is not None:
+        command, comment = cb
+        if redact:
+            numbering.context_break()
+            yield (
+                "session",
+                {"session_id": numbering.session, "context_break": clean(command)},
+                {"context_break_comment": clean(comment)} if comment else {},
+            )
+        else:
+            item: dict = {
+                "type": "context_break",
+                "command": clean(command),
+                "date": _format_timestamp(entry.timestamp),
             }
-            if not redact:
-                item["date"] = _format_timestamp(entry.timestamp)
             if raw:
                 item["timestamp_ms"] = entry.timestamp
-            session_data["prompts"].append(item)
-        data["sessions"].append(session_data)
-    return data
+            if comment:
+                item["comment"] = clean(comment)
+            yield "prompt", item, None
+        return
+
+    numbering.prompt += 1
+    title = _plan_title(entry)
+    if title is not None and not raw:
+        item = {
+            "type": "plan",
+            "title": clean(title),
+        }
+        if not redact:
+            item["date"] = _format_timestamp(entry.timestamp)
+        yield "prompt", item, None
+        return
+
+    resolved = resolve_pastes(entry, paste_cache_dir)
+    item = {"type": "prompt"}
+    if resolved == entry.display:
+        resolved = clean(resolved)
+        if not omit_same_raw:
+            item["display_raw"] = resolved
+    else:
+        item["display_raw"] = clean(entry.display)
+        resolved = clean(resolved)
+    item["display_resolved"] = resolved
+    if not redact:
+        item["date"] = _format_timestamp(entry.timestamp)
+    if raw:
+        item["timestamp_ms"] = entry.timestamp
+    yield "prompt", item, None
+
+
+def _dumps(obj: object, depth: int = 0) -> str:
+    """Serialise obj as it would appear nested depth levels deep in an
+    indent=2 document (JSON strings never contain a literal newline)."""
+    text = json.dumps(obj, indent=2, ensure_ascii=False)
+    return text.replace("\n", "\n" + "  " * depth) if depth else text
+
+
+def iter_json(
+    project: str,
+    sessions: Iterable[Session],
+    paste_cache_dir: Path,
+    raw: bool = False,
+    redact: bool = False,
+    title: Optional[str] = None,
+    depth: int = 0,
+    omit_same_raw: bool = False,
+    cache: Optional[RenderCache] = None,
+) -> Iterator[str]:
+    """Yield format_json() output in pieces, one prompt at a time.
+
+    The concatenated pieces are identical to json.dumps(indent=2) of the
+    whole project; depth indents the object for embedding in an
+    enclosing indent=2 document.  Only one prompt is held at a time.
+    With redact the pieces are fully redacted already.  With a cache,
+    unchanged sessions are read back from it.
+    """
+    label = redact_text(title or project) if redact else title or project
+    pad = "  " * depth
+    yield (
+        f"{{\n{pad}  \"project\": {_dumps(label)},\n"
+        f"{pad}  \"sessions\": ["
+    )
+
+    def render(session: Session, number: int) -> Iterator[str]:
+        return _json_session(
+            session, number, paste_cache_dir, raw, redact, omit_same_raw, depth,
+        )
+
+    options = ("json", raw, redact, omit_same_raw, depth)
+    empty = True
+    for pieces in _sessions_numbered(sessions, render, paste_cache_dir, redact, cache, options):
+        yield "\n" if empty else ",\n"
+        yield from pieces
+        empty = False
+    yield f"]\n{pad}}}" if empty else f"\n{pad}  ]\n{pad}}}"
+
+
+def _json_session(
+    session: Session,
+    display_session: int,
+    paste_cache_dir: Path,
+    raw: bool,
+    redact: bool,
+    omit_same_raw: bool,
+    depth: int,
+) -> Iterator[str]:
+    """Yield the session objects of one session, as iter_json() nests them."""
+    spad = "  " * depth + "    "  # session objects, inside the "sessions" array
+    tail: Optional[dict] = None  # of the open session object, if any
+    no_prompts = True
+    for kind, obj, session_tail in _session_events(
+        session, display_session, paste_cache_dir, raw=raw, redact=redact,
+        omit_same_raw=omit_same_raw,
+    ):
+        if kind == "prompt":
+            yield ("\n" if no_prompts else ",\n") + f"{spad}    {_dumps(obj, depth + 4)}"
+            no_prompts = False
+            continue
+        if tail is None:
+            yield f"{spad}{{"
+        else:
+            yield _close_session(tail, no_prompts, spad) + f",\n{spad}{{"
+        for key, value in obj.items():
+            yield f"\n{spad}  {_dumps(key)}: {_dumps(value)},"
+        yield f"\n{spad}  \"prompts\": ["
+        tail, no_prompts = session_tail, True
+    yield _close_session(tail, no_prompts, spad)
+
+
+def _close_session(tail: dict, no_prompts: bool, spad: str) -> str:
+    """Return the text ending a session object opened by _json_session()."""
+    text = "]" if no_prompts else f"\n{spad}  ]"
+    for key, value in tail.items():
+        text += f",\n{spad}  {_dumps(key)}: {_dumps(value)}"
+    return text + f"\n{spad}}}"
 
 
 def format_json(
@@ -211,26 +410,204 @@ def format_json(
     raw: bool = False,
     redact: bool = False,
     title: Optional[str] = None,
+    omit_same_raw: bool = False,
+    cache: Optional[RenderCache] = None,
 ) -> str:
     """Format sessions as structured JSON."""
-    return json.dumps(
-        _project_json(project, sessions, paste_cache_dir, raw=raw, redact=redact, title=title),
-        indent=2, ensure_ascii=False,
-    )
+    return "".join(iter_json(
+        project, sessions, paste_cache_dir, raw=raw, redact=redact, title=title,
+        omit_same_raw=omit_same_raw, cache=cache,
+    ))
+
+
+def iter_all_json(
+    projects: Iterable[Tuple[str, List[Session]]],
+    paste_cache_dir: Path,
+    raw: bool = False,
+    redact: bool = False,
+    omit_same_raw: bool = False,
+    cache: Optional[RenderCache] = None,
+) -> Iterator[str]:
+    """Yield format_all_json() output in pieces, one prompt at a time."""
+    empty = True
+    for project, sessions in projects:
+        yield "[\n  " if empty else ",\n  "
+        yield from iter_json(
+            project, sessions, paste_cache_dir, raw=raw, redact=redact, depth=1,
+            omit_same_raw=omit_same_raw, cache=cache,
+        )
+        empty = False
+    yield "[]" if empty else "\n]"
 
 
 def format_all_json(
-    projects: List[Tuple[str, List[Session]]],
+    projects: Iterable[Tuple[str, List[Session]]],
     paste_cache_dir: Path,
     raw: bool = False,
     redact: bool = False,
+    omit_same_raw: bool = False,
+    cache: Optional[RenderCache] = None,
 ) -> str:
     """Format all projects as a JSON array."""
-    data = [
-        _project_json(project, sessions, paste_cache_dir, raw=raw, redact=redact)
-        for project, sessions in projects
-    ]
-    return json.dumps(data, indent=2, ensure_ascii=False)
+    return "".join(iter_all_json(
+        projects, paste_cache_dir, raw=raw, redact=redact, omit_same_raw=omit_same_raw,
+        cache=cache,
+    ))
+
+
+def iter_jsonl(
+    project: str,
+    sessions: Iterable[Session],
+    paste_cache_dir: Path,
+    raw: bool = False,
+    redact: bool = False,
+    title: Optional[str] = None,
+    omit_same_raw: bool = False,
+    cache: Optional[RenderCache] = None,
+) -> Iterator[str]:
+    """Yield one compact JSON object per prompt, to be joined with newlines.
+
+    Each object is the prompt item of the JSON format with "project" and
+    "session_id" added in front.  With redact, a context break, which
+    starts a new numbered session there, becomes an item of type
+    "context_break" as it is without redact.  With a cache, unchanged
+    sessions are read back from it.
+    """
+    label = redact_text(title or project) if redact else title or project
+
+    def render(session: Session, number: int) -> Iterator[str]:
+        return _jsonl_session(
+            session, number, label, paste_cache_dir, raw, redact, omit_same_raw,
+        )
+
+    options = ("jsonl", raw, redact, omit_same_raw, label)
+    for lines in _sessions_numbered(sessions, render, paste_cache_dir, redact, cache, options):
+        yield from lines
+
+
+def _jsonl_session(
+    session: Session,
+    display_session: int,
+    label: str,
+    paste_cache_dir: Path,
+    raw: bool,
+    redact: bool,
+    omit_same_raw: bool,
+) -> Iterator[str]:
+    """Yield the lines of one session for iter_jsonl()."""
+    session_id = None
+    for kind, obj, tail in _session_events(
+        session, display_session, paste_cache_dir, raw=raw, redact=redact,
+        omit_same_raw=omit_same_raw,
+    ):
+        if kind == "session":
+            session_id = obj["session_id"]
+        line = _jsonl_line(kind, obj, tail, label, session_id)
+        if line is not None:
+            yield line
+
+
+def _jsonl_line(
+    kind: str, obj: dict, tail: Optional[dict], label: str, session_id: object
+) -> Optional[str]:
+    """Return the JSON Lines line for one _session_events() event, if any.
+
+    session_id is that of the session the event is in (or starts).
+    """
+    if kind == "prompt":
+        return json.dumps({"project": label, "session_id": session_id, **obj}, ensure_ascii=False)
+    if "context_break" not in obj:
+        return None
+    item = {
+        "project": label,
+        "session_id": session_id,
+        "type": "context_break",
+        "command": obj["context_break"],
+    }
+    if tail:
+        item["comment"] = tail["context_break_comment"]
+    return json.dumps(item, ensure_ascii=False)
+
+
+class LiveRecipe:
+    """Render a project's prompts one at a time, as they arrive (--follow).
+
+    render() returns the blocks for one new entry as iter_markdown() or
+    iter_jsonl() would produce them, each to be written followed by a
+    newline, redacted if asked.  The session heading is repeated whenever
+    prompts move to another session than the previous one; with redact,
+    sessions (and context breaks) are numbered in the order they appear.
+    """
+
+    def __init__(
+        self,
+        project: str,
+        paste_cache_dir: Path,
+        output_format: str = "markdown",
+        raw: bool = False,
+        redact: bool = False,
+        title: Optional[str] = None,
+        omit_same_raw: bool = False,
+    ) -> None:
+        self.project = project
+        self.paste_cache_dir = paste_cache_dir
+        self.output_format = output_format
+        self.raw = raw
+        self.redact = redact
+        self.title = title
+        self.omit_same_raw = omit_same_raw
+        self._label = redact_text(title or project) if redact else title or project
+        self._numbering: Dict[Optional[str], _Numbering] = {}
+        self._sessions = 0
+        self._current: Optional[_Numbering] = None
+
+    def _allocate(self) -> int:
+        self._sessions += 1
+        return self._sessions
+
+    def header(self) -> List[Chunk]:
+        """Return the blocks that start the output (the markdown title)."""
+        if self.output_format != "markdown":
+            return []
+        prefix = "Recipe (redacted)" if self.redact else "Recipe"
+        heading = f"# {self.title}\n" if self.title else f"# {prefix}: {self.project}\n"
+        return [redact_text(heading) if self.redact else heading]
+
+    def render(self, entry: PromptEntry) -> List[Chunk]:
+        """Return the blocks for entry, which must already be prepared."""
+        sid = entry.session_id
+        numbering = self._numbering.get(sid)
+        if numbering is None:
+            numbering = self._numbering[sid] = _Numbering(self._allocate(), allocate=self._allocate)
+        switched = numbering is not self._current
+        self._current = numbering
+        if self.output_format == "jsonl":
+            return self._jsonl(entry, numbering)
+
+        blocks: List[Chunk] = []
+        if switched:
+            if self.redact:
+                blocks.append(f"## Session {numbering.session}\n")
+            else:
+                blocks.append(f"## {_session_label(Session(session_id=sid))}\n")
+        blocks.extend(_markdown_entry(
+            entry, numbering, self.paste_cache_dir, self.raw, self.redact,
+            paste_regions=not self.redact,
+        ))
+        if self.redact:
+            return [redact_text(block) for block in blocks]
+        return blocks
+
+    def _jsonl(self, entry: PromptEntry, numbering: _Numbering) -> List[Chunk]:
+        lines: List[Chunk] = []
+        for kind, obj, tail in _entry_events(
+            entry, numbering, self.paste_cache_dir, self.raw, self.redact, self.omit_same_raw,
+        ):
+            session_id = numbering.session if self.redact else entry.session_id
+            line = _jsonl_line(kind, obj, tail, self._label, session_id)
+            if line is not None:
+                lines.append(line)
+        return lines
 
 
 # Capitalized word (starts uppercase, at least 3 chars, not ALL CAPS)
@@ -244,13 +621,16 @@ def format_audit(entries: List["PromptEntry"], raw: bool = False) -> str:
     With raw=True, all capitalized words are shown (useful for seeing
     which common words tend to be capitalised in your prompts).
     """
-    stopwords = [] if raw else audit_stopwords()
+    # Count every word first, so each distinct word is checked against
+    # the stopwords once rather than at every occurrence
     counts: Counter = Counter()
     for entry in entries:
-        for m in _CAP_WORD_RE.finditer(entry.display):
-            word = m.group(1)
-            if not any(p.fullmatch(word) for p in stopwords):
-                counts[word] += 1
+        counts.update(_CAP_WORD_RE.findall(entry.display))
+    if not raw:
+        counts = Counter({
+            word: count for word, count in counts.items()
+            if not is_audit_stopword(word)
+        })
 
     if not counts:
         return "No frequently used capitalized words found."
@@ -271,17 +651,44 @@ def format_audit(entries: List["PromptEntry"], raw: bool = False) -> str:
     return "\n".join(lines)
 
 
-def format_project_list(projects: List[Tuple[str, int, int]]) -> str:
+def _format_size(n: int) -> str:
+    """Format a byte count compactly (e.g. 512B, 1.2K, 3.4M)."""
+    if n < 1024:
+        return f"{n}B"
+    size = float(n)
+    for unit in "KMG":
+        size /= 1024
+        if size < 1024:
+            break
+    return f"{size:.1f}{unit}"
+
+
+def _format_date(ts: Optional[int]) -> str:
+    if ts is None:
+        return "-"
+    return datetime.fromtimestamp(ts / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def format_project_list(projects: List[ProjectStats]) -> str:
     """Format project listing as a table."""
     if not projects:
         return "No projects found."
 
     # Calculate column widths
-    header = ("Project", "Prompts", "Sessions")
+    header = ("Project", "Prompts", "Sessions", "First", "Last", "Plans", "Breaks", "Pastes")
     col_widths = [len(h) for h in header]
     rows = []
-    for path, count, sessions in projects:
-        row = (path, str(count), str(sessions))
+    for p in projects:
+        row = (
+            p.path,
+            str(p.prompts),
+            str(p.sessions),
+            _format_date(p.first_timestamp),
+            _format_date(p.last_timestamp),
+            str(p.plans),
+            str(p.context_breaks),
+            _format_size(p.paste_bytes),
+        )
         rows.append(row)
         for j, val in enumerate(row):
             col_widths[j] = max(col_widths[j], len(val))
@@ -1,14 +1,20 @@
 from __future__ import annotations
 
+import heapq
 import json
+import re
 import sys
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from extract_recipe.boilerplate import is_plan, should_skip
 
 
 @dataclass
 class PasteRef:
+    __slots__ = ("id", "type", "content_hash")
+
     id: Optional[int]
     type: Optional[str]
     content_hash: Optional[str]
@@ -16,6 +22,8 @@ class PasteRef:
 
 @dataclass
 class PromptEntry:
+    __slots__ = ("display", "pasted_contents", "timestamp", "project", "session_id")
+
     display: str
     pasted_contents: Dict[str, PasteRef]
     timestamp: int
@@ -29,43 +37,234 @@ class Session:
     prompts: List[PromptEntry] = field(default_factory=list)
 
 
-def load_history(claude_dir: Path) -> List[PromptEntry]:
-    """Parse history.jsonl and return entries sorted by timestamp."""
-    history_file = claude_dir / "history.jsonl"
+# Exceptions raised by parse_entry() for a malformed line.  ValueError
+# covers json.JSONDecodeError and invalid UTF-8.
+MALFORMED_ERRORS = (ValueError, KeyError, AttributeError, TypeError)
+
+
+def parse_entry(line: bytes) -> PromptEntry:
+    """Decode one history.jsonl line into a PromptEntry.
+
+    Raises one of MALFORMED_ERRORS if the line is not a valid entry.
+    """
+    obj = json.loads(line)
+    pasted = {}
+    for key, val in (obj.get("pastedContents") or {}).items():
+        pasted[key] = PasteRef(
+            id=val.get("id"),
+            type=val.get("type"),
+            content_hash=val.get("contentHash"),
+        )
+    return PromptEntry(
+        display=obj["display"],
+        pasted_contents=pasted,
+        timestamp=obj["timestamp"],
+        project=obj["project"],
+        session_id=obj.get("sessionId"),
+    )
+
+
+def warn_malformed(error: object, lineno: Optional[int] = None) -> None:
+    where = f" {lineno}" if lineno is not None else ""
+    print(f"Warning: skipping malformed history line{where}: {error}", file=sys.stderr)
+
+
+_PROJECT_KEY = b'"project":'
+
+
+def project_filter(project: str) -> Callable[[bytes], bool]:
+    """Return a cheap test of whether a raw line may belong to project.
+
+    The test compares the bytes after the "project": key with the
+    JSON-encoded path, so most lines of other projects are rejected without
+    being decoded.  It errs on the side of decoding: a line is only
+    rejected when it has a single project key, followed by at most one
+    space and an escape-free string that differs from project.  Lines it
+    accepts still have to be decoded and checked.
+    """
+    values = {
+        json.dumps(project).encode("ascii"),
+        json.dumps(project, ensure_ascii=False).encode("utf-8", "surrogatepass"),
+    }
+
+    def may_match(line: bytes) -> bool:
+        start = line.find(_PROJECT_KEY)
+        if start < 0 or line.find(_PROJECT_KEY, start + 1) >= 0:
+            return True  # no key at all, or a nested "project" key
+        start += len(_PROJECT_KEY)
+        if line.startswith(b" ", start):
+            start += 1
+        for value in values:
+            if line.startswith(value, start):
+                return True
+        if not line.startswith(b'"', start):
+            return True  # unusual spacing or not a string
+        end = line.find(b'"', start + 1)
+        return b"\\" in line[start + 1:end]  # escaped characters
+
+    return may_match
+
+
+def _parse_lines(
+    lines: Iterable[bytes], first_lineno: int = 1, project: Optional[str] = None
+) -> Tuple[List[PromptEntry], List[Tuple[int, str]], int]:
+    """Parse lines into entries sorted by timestamp.
+
+    With project set, only that project's entries are returned, and lines
+    that project_filter() rules out are not decoded.  Returns (entries,
+    warnings, line_count) where warnings are (line number, message) pairs
+    for malformed lines.
+    """
+    may_match = project_filter(project) if project is not None else None
     entries: List[PromptEntry] = []
-    with open(history_file, encoding="utf-8") as f:
-        for line in f:
+    warnings: List[Tuple[int, str]] = []
+    lineno = first_lineno - 1
+    for lineno, line in enumerate(lines, first_lineno):
+        line = line.strip()
+        if not line or (may_match is not None and not may_match(line)):
+            continue
+        try:
+            entry = parse_entry(line)
+        except MALFORMED_ERRORS as e:
+            warnings.append((lineno, str(e)))
+            continue
+        if project is None or entry.project == project:
+            entries.append(entry)
+    entries.sort(key=lambda e: e.timestamp)
+    return entries, warnings, lineno - first_lineno + 1
+
+
+def _parse_range(
+    history_file: Path, start: int, end: int, project: Optional[str] = None
+) -> Tuple[List[PromptEntry], List[Tuple[int, str]], int]:
+    """Worker: parse the newline-aligned byte range [start, end)."""
+    with open(history_file, "rb") as f:
+        f.seek(start)
+        lines = f.read(end - start).split(b"\n")
+    if lines[-1] == b"":
+        lines.pop()
+    return _parse_lines(lines, project=project)
+
+
+def _split_ranges(history_file: Path, parts: int) -> List[Tuple[int, int]]:
+    """Split the file into up to parts newline-aligned byte ranges."""
+    size = history_file.stat().st_size
+    bounds = [0]
+    with open(history_file, "rb") as f:
+        for i in range(1, parts):
+            target = max(size * i // parts, bounds[-1])
+            f.seek(target)
+            if target:
+                f.readline()  # advance to the start of the next line
+            if f.tell() >= size:
+                break
+            if f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def iter_history(claude_dir: Path) -> Iterator[PromptEntry]:
+    """Yield history.jsonl entries in file order, warning about bad lines."""
+    with open(claude_dir / "history.jsonl", "rb") as f:
+        for lineno, line in enumerate(f, 1):
             line = line.strip()
             if not line:
                 continue
             try:
-                obj = json.loads(line)
-                pasted = {}
-                for key, val in (obj.get("pastedContents") or {}).items():
-                    pasted[key] = PasteRef(
-                        id=val.get("id"),
-                        type=val.get("type"),
-                        content_hash=val.get("contentHash"),
-                    )
-                entries.append(PromptEntry(
-                    display=obj["display"],
-                    pasted_contents=pasted,
-                    timestamp=obj["timestamp"],
-                    project=obj["project"],
-                    session_id=obj.get("sessionId"),
-                ))
-            except (json.JSONDecodeError, KeyError, AttributeError, TypeError) as e:
-                print(f"Warning: skipping malformed history line: {e}", file=sys.stderr)
+                entry = parse_entry(line)
+            except MALFORMED_ERRORS as e:
+                warn_malformed(e, lineno)
+                continue
+            yield entry
+
+
+def load_history(
+    claude_dir: Path, jobs: int = 1, project: Optional[str] = None
+) -> List[PromptEntry]:
+    """Parse history.jsonl and return entries sorted by timestamp.
+
+    With project set, return only that project's entries, the same as
+    filter_by_project() on the full result, but without decoding most
+    other lines (see project_filter()).  Malformed lines are still only
+    reported if they could belong to project.
+
+    With jobs > 1 the file is split into newline-aligned byte ranges that
+    are parsed in a process pool, and the per-range results are merged by
+    timestamp.  The result is the same as the serial path: ties keep file
+    order, and malformed lines are reported with their line numbers.
+    """
+    history_file = claude_dir / "history.jsonl"
+    if jobs <= 1:
+        with open(history_file, "rb") as f:
+            entries, warnings, _ = _parse_lines(f, project=project)
+        for lineno, message in warnings:
+            warn_malformed(message, lineno)
+        return entries
+
+    # Imported here: multiprocessing noticeably slows every start-up
+    from concurrent.futures import ProcessPoolExecutor
+
+    ranges = _split_ranges(history_file, jobs)
+    with ProcessPoolExecutor(max_workers=min(jobs, len(ranges))) as pool:
+        results = list(pool.map(
+            _parse_range,
+            [history_file] * len(ranges),
+            [start for start, _ in ranges],
+            [end for _, end in ranges],
+            [project] * len(ranges),
+        ))
+    first_lineno = 0
+    for _, warnings, line_count in results:
+        for lineno, message in warnings:
+            warn_malformed(message, first_lineno + lineno)
+        first_lineno += line_count
+    return list(heapq.merge(
+        *(entries for entries, _, _ in results), key=lambda e: e.timestamp
+    ))
+
+
+def load_entries(claude_dir: Path, offsets: Iterable[int]) -> List[PromptEntry]:
+    """Parse only the history.jsonl lines starting at the given byte offsets.
+
+    Offsets must be in file order; the result is sorted by timestamp, so it
+    matches what load_history() followed by a filter would return.
+    """
+    history_file = claude_dir / "history.jsonl"
+    entries: List[PromptEntry] = []
+    with open(history_file, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            try:
+                entries.append(parse_entry(f.readline()))
+            except MALFORMED_ERRORS as e:
+                warn_malformed(e)
     entries.sort(key=lambda e: e.timestamp)
     return entries
 
 
-def filter_by_project(entries: List[PromptEntry], project: str) -> List[PromptEntry]:
-    """Filter entries by exact project path match."""
+def filter_by_project(entries: Sequence[PromptEntry], project: str) -> Sequence[PromptEntry]:
+    """Filter entries by exact project path match.
+
+    A columnar EntryStore returns a view of itself instead of a list.
+    """
+    select = getattr(entries, "filter_by_project", None)
+    if select is not None:
+        return select(project)
     return [e for e in entries if e.project == project]
 
 
-def group_by_session(entries: List[PromptEntry]) -> List[Session]:
+def _ordered_sessions(sessions: Dict[Optional[str], Session]) -> List[Session]:
+    """Order grouped sessions: the no-ID group first, then by start time."""
+    result: List[Session] = []
+    if None in sessions:
+        result.append(sessions.pop(None))
+    remaining = sorted(sessions.values(), key=lambda s: s.prompts[0].timestamp)
+    result.extend(remaining)
+    return result
+
+
+def group_by_session(entries: Iterable[PromptEntry]) -> List[Session]:
     """Group entries into sessions, sorted by start time.
 
     Entries without a sessionId are collected into a single Session with
@@ -77,35 +276,130 @@ def group_by_session(entries: List[PromptEntry]) -> List[Session]:
         if sid not in sessions:
             sessions[sid] = Session(session_id=sid)
         sessions[sid].prompts.append(entry)
+    return _ordered_sessions(sessions)
 
-    result: List[Session] = []
-    if None in sessions:
-        result.append(sessions.pop(None))
-    remaining = sorted(sessions.values(), key=lambda s: s.prompts[0].timestamp)
-    result.extend(remaining)
-    return result
 
+def partition_by_project(
+    entries: Iterable[PromptEntry],
+) -> Iterator[Tuple[str, List[Session]]]:
+    """Yield (project, sessions) pairs sorted by project path.
+
+    Equivalent to group_by_session(filter_by_project(entries, p)) for
+    every project p, but buckets entries by project and session in a
+    single pass.  A columnar EntryStore buckets row numbers only, so each
+    project's entries are created when its pair is reached.
+    """
+    split = getattr(entries, "split_by_project", None)
+    if split is not None:
+        for project, view in split():
+            yield project, group_by_session(view)
+        return
 
-def list_projects(entries: List[PromptEntry]) -> List[Tuple[str, int, int]]:
-    """Return (path, prompt_count, session_count) tuples sorted by path."""
-    projects: Dict[str, Dict[str, object]] = {}
+    buckets: Dict[str, Dict[Optional[str], Session]] = {}
     for entry in entries:
-        p = entry.project
-        if p not in projects:
-            projects[p] = {"count": 0, "sessions": set()}
-        projects[p]["count"] += 1
-        if entry.session_id is not None:
-            projects[p]["sessions"].add(entry.session_id)
+        sessions = buckets.get(entry.project)
+        if sessions is None:
+            sessions = buckets[entry.project] = {}
+        sid = entry.session_id
+        if sid not in sessions:
+            sessions[sid] = Session(session_id=sid)
+        sessions[sid].prompts.append(entry)
+    for project in sorted(buckets):
+        yield project, _ordered_sessions(buckets.pop(project))
+
+
+@dataclass
+class ProjectStats:
+    path: str
+    prompts: int = 0
+    sessions: int = 0  # the no-sessionId group counts as one session
+    first_timestamp: Optional[int] = None
+    last_timestamp: Optional[int] = None
+    paste_bytes: int = 0  # size of referenced paste-cache files
+    plans: int = 0
+    context_breaks: int = 0
+
+
+# Classification flags computed by classify()
+SKIP = 1
+PLAN = 2
+CONTEXT_BREAK = 4
+
+# Context-break commands: /clear, /compact, /compress
+CONTEXT_BREAK_RE = re.compile(
+    r"^/(clear|compact|compress)\s*(.*?)\s*$", re.DOTALL
+)
+
+
+def classify(display: str) -> int:
+    """Return the SKIP/PLAN/CONTEXT_BREAK flags that apply to a prompt."""
+    flags = 0
+    if should_skip(display):
+        flags |= SKIP
+    if is_plan(display):
+        flags |= PLAN
+    if CONTEXT_BREAK_RE.match(display):
+        flags |= CONTEXT_BREAK
+    return flags
+
+
+# (project, session_id, timestamp, flags, paste content hashes)
+StatsRow = Tuple[str, Optional[str], int, int, Iterable[Optional[str]]]
+
+
+def aggregate_stats(
+    rows: Iterable[StatsRow], paste_sizes: Optional[Dict[str, int]] = None
+) -> List[ProjectStats]:
+    """Aggregate per-project statistics in one pass, sorted by path.
+
+    paste_sizes maps content hash to paste-cache file size; hashes not in
+    it (missing files) contribute nothing to paste_bytes.
+    """
+    paste_sizes = paste_sizes or {}
+    projects: Dict[str, ProjectStats] = {}
+    sessions: Dict[str, set] = {}
+    for project, session_id, timestamp, flags, hashes in rows:
+        stats = projects.get(project)
+        if stats is None:
+            stats = projects[project] = ProjectStats(
+                path=project, first_timestamp=timestamp, last_timestamp=timestamp
+            )
+            sessions[project] = set()
+        stats.prompts += 1
+        sessions[project].add(session_id)
+        if timestamp < stats.first_timestamp:
+            stats.first_timestamp = timestamp
+        if timestamp > stats.last_timestamp:
+            stats.last_timestamp = timestamp
+        for h in hashes:
+            stats.paste_bytes += paste_sizes.get(h, 0)
+        if flags & PLAN:
+            stats.plans += 1
+        if flags & CONTEXT_BREAK:
+            stats.context_breaks += 1
 
     result = []
     for path in sorted(projects):
-        info = projects[path]
-        session_count = len(info["sessions"])
-        # Count None-session group as 1 session if there are entries without sessionId
-        has_none = any(
-            e.session_id is None and e.project == path for e in entries
-        )
-        if has_none:
-            session_count += 1
-        result.append((path, info["count"], session_count))
+        stats = projects[path]
+        stats.sessions = len(sessions[path])
+        result.append(stats)
     return result
+
+
+def list_projects(
+    entries: Iterable[PromptEntry], paste_sizes: Optional[Dict[str, int]] = None
+) -> List[ProjectStats]:
+    """Return per-project statistics sorted by path."""
+    return aggregate_stats(
+        (
+            (
+                e.project,
+                e.session_id,
+                e.timestamp,
+                classify(e.display),
+                [ref.content_hash for ref in e.pasted_contents.values()],
+            )
+            for e in entries
+        ),
+        paste_sizes,
+    )
@@ -0,0 +1,339 @@
+"""Persistent index of history.jsonl.
+
+The index records, for every project, the byte offset of each of its
+lines together with the per-entry fields needed for --list and project
+matching (timestamp, session id, paste hashes, and whether the prompt
+matches [skip] or [plan] or is a context break).  A repeat run
+can then seek straight to one project's lines instead of decoding the
+whole history, and --list needs no JSON parsing at all.
+
+The index is stored under ~/.cache/extract-recipe/ (or $XDG_CACHE_HOME);
+as it holds project paths and session ids, that directory is created
+0700 and the index 0600.  It is reused as-is while the history file's
+size, mtime and inode and the [skip] and [plan] patterns are unchanged.  history.jsonl only ever
+grows by appending, so when the file is larger than the indexed size and the
+block just before the indexed end still has the same checksum, only the
+appended lines are scanned and merged in.  Anything else (truncation, a
+rewrite, a new inode) triggers a full rebuild.
+
+An unterminated final line that does not parse yet is assumed to be
+still being written: it is left out of the index and rescanned next
+time.  Malformed lines are recorded with their warnings, which are
+printed again whenever a stored index is reused, as they would be by a
+run that parses the whole history.  The index is written with marshal, which handles
+plain ints, strings, lists and dicts quickly and never executes code on
+load.  Each project's columns are marshalled separately and only
+decoded when that project is used, alongside a count of its prompts not
+matching [skip]; matching a project name and extracting it therefore
+costs in proportion to that project, not to the whole history.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import marshal
+import os
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from extract_recipe.boilerplate import section_digest
+from extract_recipe.history import (
+    MALFORMED_ERRORS,
+    SKIP,
+    ProjectStats,
+    PromptEntry,
+    aggregate_stats,
+    classify,
+    load_entries,
+    parse_entry,
+    warn_malformed,
+)
+
+# Bump when the on-disk layout changes
+INDEX_VERSION = 6
+
+# Size of the block before the indexed end whose checksum detects rewrites
+_TAIL_BLOCK = 4096
+
+
+@dataclass
+class ProjectIndex:
+    """Per-entry columns for one project, in file order."""
+    offsets: List[int] = field(default_factory=list)
+    timestamps: List[int] = field(default_factory=list)
+    session_ids: List[Optional[str]] = field(default_factory=list)
+    flags: bytearray = field(default_factory=bytearray)  # classify() flags
+    # Paste content hashes, keyed by row (most entries have none)
+    pastes: Dict[int, Tuple[Optional[str], ...]] = field(default_factory=dict)
+
+
+def _pack(proj: ProjectIndex) -> bytes:
+    return marshal.dumps((
+        proj.offsets, proj.timestamps, proj.session_ids, bytes(proj.flags), proj.pastes,
+    ))
+
+
+def _unpack(blob: bytes) -> ProjectIndex:
+    offsets, timestamps, session_ids, flags, pastes = marshal.loads(blob)
+    return ProjectIndex(offsets, timestamps, session_ids, bytearray(flags), pastes)
+
+
+@dataclass
+class HistoryIndex:
+    size: int  # bytes of history.jsonl covered by the index
+    mtime_ns: int
+    inode: int
+    config: str
+    tail_crc: int = 0  # crc32 of the _TAIL_BLOCK bytes ending at size
+    lines: int = 0  # lines covered, for warning line numbers
+    # (line number, message) of each malformed line covered
+    malformed: List[Tuple[int, str]] = field(default_factory=list)
+    # Entries not matching [skip], for every project
+    unskipped: Dict[str, int] = field(default_factory=dict)
+    # Decoded projects, and projects still marshalled as read from disk
+    projects: Dict[str, ProjectIndex] = field(default_factory=dict)
+    packed: Dict[str, bytes] = field(default_factory=dict)
+
+    def project(self, path: str) -> ProjectIndex:
+        """Return the columns of a project, decoding or creating them."""
+        proj = self.projects.get(path)
+        if proj is None:
+            blob = self.packed.pop(path, None)
+            proj = ProjectIndex() if blob is None else _unpack(blob)
+            self.projects[path] = proj
+            self.unskipped.setdefault(path, 0)
+        return proj
+
+    def paths(self, raw: bool = False) -> List[str]:
+        """Return sorted project paths with at least one unskipped entry."""
+        return sorted(
+            path for path, count in self.unskipped.items() if raw or count
+        )
+
+    def list_projects(
+        self, raw: bool = False, paste_sizes: Optional[Dict[str, int]] = None
+    ) -> List[ProjectStats]:
+        """Return per-project statistics like history.list_projects()."""
+        def rows():
+            for path in self.unskipped:
+                proj = self.project(path)
+                for i, (ts, sid, flags) in enumerate(
+                    zip(proj.timestamps, proj.session_ids, proj.flags)
+                ):
+                    if flags & SKIP and not raw:
+                        continue
+                    yield path, sid, ts, flags, proj.pastes.get(i, ())
+        return aggregate_stats(rows(), paste_sizes)
+
+    def load(self, claude_dir: Path, projects: List[str]) -> List[PromptEntry]:
+        """Parse the entries of the given projects, sorted by timestamp."""
+        offsets = sorted(
+            offset for p in projects for offset in self.project(p).offsets
+        )
+        return load_entries(claude_dir, offsets)
+
+
+def cache_dir() -> Path:
+    """Return the directory for extract-recipe's caches."""
+    base = os.environ.get("XDG_CACHE_HOME")
+    return (Path(base) if base else Path.home() / ".cache") / "extract-recipe"
+
+
+def private_dir(directory: Path) -> None:
+    """Create directory, or restrict an existing one, to its owner.
+
+    Missing parents are created the same way, as the caches hold project
+    paths and prompt text.
+    """
+    if not directory.parent.exists():
+        private_dir(directory.parent)
+    directory.mkdir(mode=0o700, exist_ok=True)
+    if directory.stat().st_mode & 0o077:
+        os.chmod(directory, 0o700)  # created by an earlier version
+
+
+def _index_path(history_file: Path) -> Path:
+    key = hashlib.sha1(str(history_file.resolve()).encode("utf-8")).hexdigest()
+    return cache_dir() / f"history-{key[:16]}.idx"
+
+
+def _tail_crc(f: BinaryIO, end: int) -> int:
+    start = max(0, end - _TAIL_BLOCK)
+    f.seek(start)
+    return zlib.crc32(f.read(end - start))
+
+
+def _scan(index: HistoryIndex, f: BinaryIO) -> None:
+    """Add the lines from index.size to EOF to the index."""
+    f.seek(index.size)
+    offset = index.size
+    for line in f:
+        start = offset
+        offset += len(line)
+        stripped = line.strip()
+        if stripped:
+            try:
+                entry = parse_entry(stripped)
+            except MALFORMED_ERRORS as e:
+                if not line.endswith(b"\n"):
+                    break  # partially written; pick it up next time
+                index.malformed.append((index.lines + 1, str(e)))
+            else:
+                proj = index.project(entry.project)
+                flags = classify(entry.display)
+                if not flags & SKIP:
+                    index.unskipped[entry.project] += 1
+                if entry.pasted_contents:
+                    proj.pastes[len(proj.offsets)] = tuple(
+                        ref.content_hash for ref in entry.pasted_contents.values()
+                    )
+                proj.offsets.append(start)
+                proj.timestamps.append(entry.timestamp)
+                proj.session_ids.append(entry.session_id)
+                proj.flags.append(flags)
+        index.size = offset
+        index.lines += 1
+
+
+def _extend(index: HistoryIndex, f: BinaryIO) -> HistoryIndex:
+    """Scan new lines into index and refresh its file identity."""
+    st = os.fstat(f.fileno())
+    index.mtime_ns = st.st_mtime_ns
+    index.inode = st.st_ino
+    _scan(index, f)
+    index.tail_crc = _tail_crc(f, index.size)
+    return index
+
+
+def _warn(malformed: List[Tuple[int, str]]) -> None:
+    for lineno, message in malformed:
+        warn_malformed(message, lineno)
+
+
+def _build(history_file: Path) -> HistoryIndex:
+    with open(history_file, "rb") as f:
+        index = HistoryIndex(
+            size=0, mtime_ns=0, inode=0, config=section_digest("skip", "plan")
+        )
+        return _extend(index, f)
+
+
+def build_index(history_file: Path) -> HistoryIndex:
+    """Scan history.jsonl once and build an index of it."""
+    index = _build(history_file)
+    _warn(index.malformed)
+    return index
+
+
+def update_index(history_file: Path, index: HistoryIndex) -> HistoryIndex:
+    """Bring a previously built index up to date with history_file.
+
+    Returns index itself if the file is unchanged or has only been
+    appended to, otherwise a freshly built index.  Warns about the
+    malformed lines it scans.
+    """
+    known = len(index.malformed)
+    updated = _update(history_file, index)
+    _warn(updated.malformed[known:] if updated is index else updated.malformed)
+    return updated
+
+
+def _update(history_file: Path, index: HistoryIndex) -> HistoryIndex:
+    with open(history_file, "rb") as f:
+        st = os.fstat(f.fileno())
+        if (
+            index.size == st.st_size
+            and index.mtime_ns == st.st_mtime_ns
+            and index.inode == st.st_ino
+        ):
+            return index
+        if (
+            index.inode == st.st_ino
+            and index.size < st.st_size
+            and _tail_crc(f, index.size) == index.tail_crc
+        ):
+            return _extend(index, f)
+    return _build(history_file)
+
+
+def _read_index(path: Path) -> Optional[HistoryIndex]:
+    try:
+        with open(path, "rb") as f:
+            data = marshal.load(f)
+        if data.get("version") != INDEX_VERSION:
+            return None
+        return HistoryIndex(
+            size=data["size"],
+            mtime_ns=data["mtime_ns"],
+            inode=data["inode"],
+            config=data["config"],
+            tail_crc=data["tail_crc"],
+            lines=data["lines"],
+            malformed=[tuple(w) for w in data["malformed"]],
+            unskipped={p: count for p, (count, _) in data["projects"].items()},
+            packed={p: blob for p, (_, blob) in data["projects"].items()},
+        )
+    except (OSError, EOFError, ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+
+def _write_index(path: Path, index: HistoryIndex) -> None:
+    data = {
+        "version": INDEX_VERSION,
+        "size": index.size,
+        "mtime_ns": index.mtime_ns,
+        "inode": index.inode,
+        "config": index.config,
+        "tail_crc": index.tail_crc,
+        "lines": index.lines,
+        "malformed": index.malformed,
+        "projects": {
+            p: (
+                count,
+                _pack(index.projects[p]) if p in index.projects else index.packed[p],
+            )
+            for p, count in index.unskipped.items()
+        },
+    }
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        private_dir(path.parent)
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump(data, f)
+        os.replace(tmp, path)
+    except OSError:
+        # The cache is an optimisation; a read-only home is not an error
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+def open_index(claude_dir: Path, use_cache: bool = True) -> HistoryIndex:
+    """Return an up-to-date index for claude_dir/history.jsonl.
+
+    With use_cache=True, a stored index is reused if it still matches the
+    config, extended with any lines appended since it was saved, and saved
+    again if anything changed.  Warns about every malformed line in the
+    history, as parsing all of it would.  Raises FileNotFoundError if the
+    history file does not exist.
+    """
+    history_file = claude_dir / "history.jsonl"
+    if not use_cache:
+        return build_index(history_file)
+
+    path = _index_path(history_file)
+    stored = _read_index(path)
+    if stored is not None and stored.config == section_digest("skip", "plan"):
+        before = (stored.size, stored.mtime_ns, stored.inode)
+        index = _update(history_file, stored)
+        if index is not stored or (index.size, index.mtime_ns, index.inode) != before:
+            _write_index(path, index)
+    else:
+        index = _build(history_file)
+        _write_index(path, index)
+    _warn(index.malformed)
+    return index
@@ -0,0 +1,123 @@
+"""Write rendered output to stdout or a file as it is produced.
+
+Output arrives as an iterable of chunks.  A chunk is normally a string,
+but a markdown prompt with large pastes may instead be a list of strings
+and PasteRegions (see paste.resolve_paste_regions).  Those paste-cache
+files are copied straight to the output file descriptor with
+os.sendfile, or from an mmap of the file where sendfile is unavailable,
+so a multi-megabyte paste is never decoded into a Python string.
+"""
+
+from __future__ import annotations
+
+import codecs
+import mmap
+import os
+import sys
+from pathlib import Path
+from typing import Iterable, List, TextIO, Union
+
+from extract_recipe import profiling
+from extract_recipe.paste import PasteRegion
+
+Chunk = Union[str, List[Union[str, PasteRegion]]]
+
+
+def write_output(output: Union[str, Iterable[Chunk]], filepath: str) -> None:
+    """Write output (a string or an iterable of chunks) as it is produced.
+
+    Standard output gets a trailing newline, as print() would add.
+    """
+    chunks = [output] if isinstance(output, str) else output
+    with profiling.stage("write_output") as span:
+        if filepath:
+            with open(filepath, "w", encoding="utf-8") as f:
+                span.bytes_out = _write_chunks(f, chunks)
+            print(f"Written to {filepath}", file=sys.stderr)
+        else:
+            span.bytes_out = _write_chunks(sys.stdout, chunks)
+            sys.stdout.write("\n")
+
+
+def write_blocks(f: TextIO, blocks: Iterable[Chunk]) -> None:
+    """Write each block followed by a newline, then flush f.
+
+    For output that grows as prompts arrive (--follow): what has been
+    written so far always reads as a complete document.
+    """
+    with profiling.stage("write_output") as span:
+        for block in blocks:
+            span.bytes_out += _write_chunks(f, [block]) + f.write("\n")
+        f.flush()
+
+
+def write_file(filepath: Path, chunks: Iterable[Chunk]) -> None:
+    """Write chunks to filepath quietly, replacing it only once complete."""
+    tmp = filepath.with_name(f".{filepath.name}.{os.getpid()}.tmp")
+    try:
+        with profiling.stage("write_output") as span, open(tmp, "w", encoding="utf-8") as f:
+            span.bytes_out = _write_chunks(f, chunks)
+        os.replace(tmp, filepath)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def _write_chunks(f: TextIO, chunks: Iterable[Chunk]) -> int:
+    """Write chunks to f; return the characters (and paste bytes) written."""
+    raw_ok = _is_utf8(f.encoding)
+    written = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            written += f.write(chunk)
+            continue
+        for piece in chunk:
+            if isinstance(piece, str):
+                written += f.write(piece)
+            elif raw_ok:
+                f.flush()
+                _copy_region(f.fileno(), piece)
+                written += piece.size
+            else:
+                with open(piece.path, encoding="utf-8") as src:
+                    written += f.write(src.read())
+    return written
+
+
+def _is_utf8(encoding: str) -> bool:
+    try:
+        return codecs.lookup(encoding).name == "utf-8"
+    except (LookupError, TypeError):
+        return False
+
+
+def _copy_region(out_fd: int, region: PasteRegion) -> None:
+    """Copy a paste-cache file to out_fd without reading it into Python."""
+    with open(region.path, "rb") as src:
+        size = os.fstat(src.fileno()).st_size
+        if size == 0:
+            return
+        sent = 0
+        sendfile = getattr(os, "sendfile", None)
+        if sendfile is not None:
+            try:
+                while sent < size:
+                    n = sendfile(out_fd, src.fileno(), sent, size - sent)
+                    if n == 0:
+                        break
+                    sent += n
+                return
+            except OSError:
+                if sent:
+                    raise
+        # e.g. O_APPEND output or no sendfile on this platform
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                while sent < size:
+                    sent += os.write(out_fd, view[sent:])
+            finally:
+                view.release()
@@ -1,36 +1,235 @@
 from __future__ import annotations
 
+import mmap
+import os
 import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
-from extract_recipe.history import PromptEntry
+from extract_recipe import profiling
+from extract_recipe.history import PromptEntry, Session
 
 PASTE_PATTERN = re.compile(r'\[Pasted text #(\d+) \+(\d+) lines?\]')
 
+# Default LRU budget for cached paste contents
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
 
-def resolve_pastes(entry: PromptEntry, paste_cache_dir: Path) -> str:
-    """Return display text with paste markers replaced by actual content.
+# Pastes at least this large may be copied straight from the cache file
+# to the output instead of being read into memory (see PasteStore.region)
+REGION_MIN_BYTES = 64 * 1024
 
-    Paste markers like [Pasted text #2 +26 lines] are replaced with the
-    file content fenced by delimiter lines. If the cache file is missing,
-    a note is inserted instead.
+
+class PasteRegion(NamedTuple):
+    """A paste-cache file to be copied verbatim into the output."""
+    path: Path
+    size: int
+
+
+def paste_sizes(paste_cache_dir: Path) -> Dict[str, int]:
+    """Return {content_hash: file size} for the paste cache, in one scan."""
+    sizes: Dict[str, int] = {}
+    try:
+        with os.scandir(paste_cache_dir) as it:
+            for de in it:
+                if de.name.endswith(".txt"):
+                    try:
+                        sizes[de.name[:-4]] = de.stat().st_size
+                    except OSError:
+                        pass
+    except OSError:
+        pass
+    return sizes
+
+
+class PasteStore:
+    """Content-addressed reader for paste-cache/<hash>.txt files.
+
+    Which files exist is learnt from one os.scandir of the directory
+    (taken on first use, or again after refresh()) instead of a stat per
+    lookup.  Contents are kept in an LRU bounded by max_bytes of file
+    size, so a paste referenced by many prompts or projects is read once.
+    Safe to use from several threads.
     """
-    def replace_match(m: re.Match) -> str:
+
+    def __init__(self, paste_cache_dir: Path, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        self.paste_cache_dir = paste_cache_dir
+        self.max_bytes = max_bytes
+        self._sizes: Optional[Dict[str, int]] = None
+        self._cache: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def sizes(self) -> Dict[str, int]:
+        """Return {content_hash: file size} from the directory scan."""
+        if self._sizes is None:
+            self._sizes = paste_sizes(self.paste_cache_dir)
+        return self._sizes
+
+    def refresh(self) -> None:
+        """Rescan the directory to pick up newly written pastes."""
+        self._sizes = paste_sizes(self.paste_cache_dir)
+
+    def get(self, content_hash: str) -> Optional[str]:
+        """Return the paste content, or None if the cache file is missing."""
+        with self._lock:
+            cached = self._cache.get(content_hash)
+            if cached is not None:
+                self._cache.move_to_end(content_hash)
+                if profiling.current is not None:
+                    profiling.current.count("paste_cache_hits")
+                return cached[0]
+        size = self.sizes().get(content_hash)
+        if size is None:
+            if profiling.current is not None:
+                profiling.current.count("paste_missing")
+            return None
+        try:
+            with open(self.paste_cache_dir / f"{content_hash}.txt", encoding="utf-8") as f:
+                content = f.read()
+        except FileNotFoundError:
+            if profiling.current is not None:
+                profiling.current.count("paste_missing")
+            return None
+        if profiling.current is not None:
+            profiling.current.count("paste_cache_misses")
+        self._remember(content_hash, content, size)
+        return content
+
+    def _remember(self, content_hash: str, content: str, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if content_hash in self._cache:
+                return
+            self._cache[content_hash] = (content, size)
+            self._cached_bytes += size
+            while self._cached_bytes > self.max_bytes:
+                _, (_, old_size) = self._cache.popitem(last=False)
+                self._cached_bytes -= old_size
+
+    def region(self, content_hash: str) -> Optional[PasteRegion]:
+        """Return a PasteRegion for a large paste that can be copied as-is.
+
+        Returns None for missing or small pastes, and for files containing
+        a carriage return, which reading in text mode would translate.
+        The file is checked through mmap, without copying it into memory.
+        """
+        size = self.sizes().get(content_hash)
+        if size is None or size < REGION_MIN_BYTES:
+            return None
+        path = self.paste_cache_dir / f"{content_hash}.txt"
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm.find(b"\r") != -1:
+                    return None
+        except (OSError, ValueError):
+            return None
+        if profiling.current is not None:
+            profiling.current.count("paste_regions")
+        return PasteRegion(path, size)
+
+    def prefetch(self, hashes: Iterable[Optional[str]], workers: int = 8) -> None:
+        """Read the given pastes into the LRU using a thread pool.
+
+        Stops queueing once the hashes to read would exceed max_bytes,
+        since anything beyond that would only be evicted again.
+        """
+        sizes = self.sizes()
+        todo = []
+        budget = self.max_bytes
+        for h in dict.fromkeys(hashes):
+            if h is None or h not in sizes or h in self._cache:
+                continue
+            if sizes[h] > budget:
+                break
+            budget -= sizes[h]
+            todo.append(h)
+        if not todo:
+            return
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(self.get, todo))
+
+
+_stores: Dict[Path, PasteStore] = {}
+
+
+def get_store(paste_cache_dir: Path) -> PasteStore:
+    """Return the shared PasteStore for a paste-cache directory."""
+    store = _stores.get(paste_cache_dir)
+    if store is None:
+        store = _stores[paste_cache_dir] = PasteStore(paste_cache_dir)
+    return store
+
+
+def session_hashes(sessions: Iterable[Session]) -> Iterator[Optional[str]]:
+    """Yield the content hash of every paste referenced by the sessions."""
+    for session in sessions:
+        for entry in session.prompts:
+            for ref in entry.pasted_contents.values():
+                yield ref.content_hash
+
+
+def _resolve(
+    entry: PromptEntry, store: PasteStore, regions: bool
+) -> List[Union[str, PasteRegion]]:
+    """Split display text into literal pieces and resolved pastes."""
+    profile = profiling.current
+    if profile is not None:
+        profile.start("resolve_pastes")
+    text = entry.display
+    pieces: List[Union[str, PasteRegion]] = []
+    pos = 0
+    for m in PASTE_PATTERN.finditer(text):
+        pieces.append(text[pos:m.start()])
+        pos = m.end()
         paste_id = m.group(1)
         ref = entry.pasted_contents.get(paste_id)
         if ref is None or ref.content_hash is None:
-            return m.group(0)  # no ref info or no hash, leave as-is
-
-        cache_file = paste_cache_dir / f"{ref.content_hash}.txt"
-        if cache_file.exists():
-            content = cache_file.read_text(encoding="utf-8")
-            return (
-                f"\n--- Pasted text #{paste_id} ---\n"
-                f"{content}\n"
-                f"--- End pasted text #{paste_id} ---\n"
-            )
+            pieces.append(m.group(0))  # no ref info or no hash, leave as-is
+            continue
+
+        content = store.region(ref.content_hash) if regions else None
+        if content is None:
+            content = store.get(ref.content_hash)
+        if content is not None:
+            pieces.append(f"\n--- Pasted text #{paste_id} ---\n")
+            pieces.append(content)
+            pieces.append(f"\n--- End pasted text #{paste_id} ---\n")
         else:
-            return f"[Pasted text #{paste_id}: cache file missing ({ref.content_hash}.txt)]"
+            pieces.append(f"[Pasted text #{paste_id}: cache file missing ({ref.content_hash}.txt)]")
+    pieces.append(text[pos:])
+    if profile is not None:
+        profile.stop(len(text), profiling.chunk_size(pieces))
+    return pieces
+
+
+def _as_store(pastes: Union[Path, PasteStore]) -> PasteStore:
+    return pastes if isinstance(pastes, PasteStore) else get_store(pastes)
+
 
-    return PASTE_PATTERN.sub(replace_match, entry.display)
+def resolve_pastes(entry: PromptEntry, pastes: Union[Path, PasteStore]) -> str:
+    """Return display text with paste markers replaced by actual content.
+
+    Paste markers like [Pasted text #2 +26 lines] are replaced with the
+    file content fenced by delimiter lines. If the cache file is missing,
+    a note is inserted instead.  pastes is a PasteStore or a paste-cache
+    directory (read through its shared store).
+    """
+    return "".join(_resolve(entry, _as_store(pastes), regions=False))
+
+
+def resolve_paste_regions(
+    entry: PromptEntry, pastes: Union[Path, PasteStore]
+) -> Union[str, List[Union[str, PasteRegion]]]:
+    """Like resolve_pastes(), but leave large pastes as PasteRegions.
+
+    Returns a plain string when no paste qualifies, otherwise a list of
+    strings and PasteRegions for output.write_output() to splice in.
+    """
+    pieces = _resolve(entry, _as_store(pastes), regions=True)
+    if any(isinstance(piece, PasteRegion) for piece in pieces):
+        return pieces
+    return "".join(pieces)
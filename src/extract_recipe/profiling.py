@@ -0,0 +1,302 @@
+"""Per-stage timing for --profile.
+
+When profiling is enabled, the pipeline's stages record into the
+current Profile:
+
+  - open_index: loading (or updating) the history index
+  - load_history: reading and parsing history.jsonl lines
+  - skip, strip: dropping [skip] prompts and removing [strip] text
+  - group_by_session: splitting entries into projects and sessions
+  - resolve_pastes: inlining pasted content
+  - format_*: the formatters, as their output is consumed
+  - redact: [redact] substitutions
+  - write_output: writing what the formatters produce
+
+Times are exclusive: while a stage runs inside another (a paste being
+resolved while a prompt is formatted, say) the outer stage is paused,
+so the stage times add up to the run.  Each stage also counts calls
+and its input and output size (text in characters, files in bytes), and
+the paste store counts LRU hits, file reads, missing files and pastes
+copied straight to the output, and the render cache its hits and misses.
+
+With patterns=True, each [skip], [plan], [strip] and [redact] pattern is
+also run on its own over the prompts being prepared, so that the cost
+of the combined matchers can be pinned on individual patterns.  That
+repeats the work, so it is off by default.
+
+Only the main process is profiled; with -j, parsing and -a rendering in
+worker processes shows up as time in the stage that waited for them.
+When profiling is off, `current` is None and each instrumented call
+site costs one global lookup.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from extract_recipe.boilerplate import redact_patterns, section_patterns
+
+T = TypeVar("T")
+
+# Sections timed pattern by pattern, with whether each pattern is used
+# for a substitution (rather than a search)
+_PATTERN_SECTIONS = (("skip", False), ("plan", False), ("strip", True), ("redact", True))
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0  # excluding nested stages
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+
+@dataclass
+class PatternStats:
+    section: str
+    pattern: str
+    calls: int = 0
+    matches: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0  # slowest single call
+    max_chars: int = 0  # length of the text of the slowest call
+
+
+@dataclass
+class Span:
+    """Input and output size of one stage call, set by the caller."""
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+
+@dataclass
+class Profile:
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+    patterns: Optional[Dict[Tuple[str, str], PatternStats]] = None
+    started: float = field(default_factory=time.perf_counter)
+    # [stage name, time it last started or resumed] for each open stage
+    _stack: List[list] = field(default_factory=list)
+
+    def start(self, name: str) -> None:
+        now = time.perf_counter()
+        if self._stack:
+            outer = self._stack[-1]
+            self._stats(outer[0]).seconds += now - outer[1]
+        self._stack.append([name, now])
+
+    def stop(self, bytes_in: int = 0, bytes_out: int = 0, calls: int = 1) -> None:
+        now = time.perf_counter()
+        name, resumed = self._stack.pop()
+        stats = self._stats(name)
+        stats.seconds += now - resumed
+        stats.calls += calls
+        stats.bytes_in += bytes_in
+        stats.bytes_out += bytes_out
+        if self._stack:
+            self._stack[-1][1] = now
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def _stats(self, name: str) -> StageStats:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        return stats
+
+    def time_patterns(self, texts: Iterable[str]) -> None:
+        """Run each pattern of the boilerplate sections over texts."""
+        if self.patterns is None:
+            return
+        texts = list(texts)
+        for section, substitutes in _PATTERN_SECTIONS:
+            if section == "redact":
+                patterns = [p for p, _ in redact_patterns()]
+            else:
+                patterns = section_patterns(section)
+            for pattern in patterns:
+                key = (section, pattern.pattern)
+                stats = self.patterns.get(key)
+                if stats is None:
+                    stats = self.patterns[key] = PatternStats(section, pattern.pattern)
+                _time_pattern(stats, pattern, texts, substitutes)
+
+    def as_dict(self) -> dict:
+        data = {
+            "seconds": time.perf_counter() - self.started,
+            "stages": {name: asdict(s) for name, s in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+        if self.patterns is not None:
+            data["patterns"] = [asdict(p) for p in self._slowest_patterns()]
+        return data
+
+    def _slowest_patterns(self) -> List[PatternStats]:
+        return sorted(self.patterns.values(), key=lambda p: p.seconds, reverse=True)
+
+    def format(self) -> str:
+        """Return a table of the stages (slowest first) and counters.
+
+        Percentages are of the time since profiling was enabled; the rest
+        is spent outside any stage (argument parsing, config loading).
+        """
+        total = time.perf_counter() - self.started
+        lines = [
+            "Stage                seconds      %     calls    bytes in   bytes out",
+            "-------------------  -------  -----  --------  ----------  ----------",
+        ]
+        for name, s in sorted(self.stages.items(), key=lambda kv: kv[1].seconds, reverse=True):
+            lines.append(
+                f"{name:<19}  {s.seconds:7.3f}  {100 * s.seconds / total:5.1f}"
+                f"  {s.calls:8d}  {s.bytes_in:10d}  {s.bytes_out:10d}"
+            )
+        lines.append(f"{'total':<19}  {total:7.3f}")
+        if self.counters:
+            lines.append("")
+            lines.extend(f"{name}: {n}" for name, n in sorted(self.counters.items()))
+        if self.patterns is not None:
+            lines.append("")
+            lines.append("Section  seconds  slowest call (chars)  matches  pattern")
+            lines.append("-------  -------  --------------------  -------  -------")
+            for p in self._slowest_patterns():
+                slowest = f"{p.max_seconds:.4f}s ({p.max_chars})"
+                lines.append(
+                    f"{p.section:<7}  {p.seconds:7.3f}  {slowest:<20}  {p.matches:7d}  {p.pattern}"
+                )
+        return "\n".join(lines)
+
+
+def _time_pattern(
+    stats: PatternStats, pattern: re.Pattern, texts: List[str], substitutes: bool
+) -> None:
+    clock = time.perf_counter
+    for text in texts:
+        start = clock()
+        if substitutes:
+            matched = pattern.subn("", text)[1] > 0
+        else:
+            matched = pattern.search(text) is not None
+        elapsed = clock() - start
+        stats.calls += 1
+        stats.matches += matched
+        stats.seconds += elapsed
+        if elapsed > stats.max_seconds:
+            stats.max_seconds = elapsed
+            stats.max_chars = len(text)
+
+
+# The profile being recorded, if any
+current: Optional[Profile] = None
+
+
+def enable(patterns: bool = False) -> Profile:
+    """Start recording; with patterns, also time individual patterns."""
+    global current
+    current = Profile(patterns={} if patterns else None)
+    return current
+
+
+def disable() -> None:
+    """Stop recording (a --serve server profiles each request separately)."""
+    global current
+    current = None
+
+
+@contextmanager
+def stage(name: str) -> Iterator[Span]:
+    """Record the enclosed block as one call of stage name.
+
+    The caller may set bytes_in and bytes_out on the yielded Span.
+    """
+    span = Span()
+    profile = current
+    if profile is None:
+        yield span
+        return
+    profile.start(name)
+    try:
+        yield span
+    finally:
+        profile.stop(span.bytes_in, span.bytes_out)
+
+
+def timed_iter(name: str, items: Iterable[T]) -> Iterable[T]:
+    """Record the work of producing each item of items as stage name.
+
+    Returns items unchanged when profiling is off.  The size of string
+    items (and of markdown chunks) counts as output.
+    """
+    profile = current
+    if profile is None:
+        return items
+    return _timed_iter(profile, name, iter(items))
+
+
+def _timed_iter(profile: Profile, name: str, items: Iterator[T]) -> Iterator[T]:
+    calls = 1
+    while True:
+        profile.start(name)
+        try:
+            item = next(items)
+        except StopIteration:
+            profile.stop(calls=calls)
+            return
+        except BaseException:
+            profile.stop(calls=calls)
+            raise
+        profile.stop(bytes_out=chunk_size(item), calls=calls)
+        calls = 0
+        yield item
+
+
+def timed_text(name: str, fn: Callable[[str], T]) -> Callable[[str], T]:
+    """Return fn(text), recording each call as stage name.
+
+    Returns fn itself when profiling is off.
+    """
+    profile = current
+    if profile is None:
+        return fn
+
+    def timed(text: str) -> T:
+        profile.start(name)
+        try:
+            result = fn(text)
+        except BaseException:
+            profile.stop(len(text))
+            raise
+        profile.stop(len(text), len(result) if isinstance(result, str) else 0)
+        return result
+
+    return timed
+
+
+def chunk_size(chunk: object) -> int:
+    """Return the size of an output chunk (characters, plus paste bytes)."""
+    if isinstance(chunk, str):
+        return len(chunk)
+    if isinstance(chunk, list):
+        return sum(len(p) if isinstance(p, str) else getattr(p, "size", 0) for p in chunk)
+    return 0
+
+
+def report(target: str) -> None:
+    """Write the current profile to stderr ("-") or as JSON to a file."""
+    if current is None:
+        return
+    if target == "-":
+        print(current.format(), file=sys.stderr)
+        return
+    try:
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump(current.as_dict(), f, indent=2)
+            f.write("\n")
+    except OSError as e:
+        print(f"Warning: could not write profile to {target}: {e}", file=sys.stderr)
@@ -3,17 +3,38 @@
 Simple pattern→replacement pairs are loaded from boilerplate.conf [redact].
 UUIDs embedded in prompt text are replaced with [UUID].
 Session IDs and timestamps are handled at format time (formatter.py).
+
+The patterns are applied one after another in config order.  Most of
+them can only match text containing some fixed substring (AKIA, ghp_,
+" UTC", ...), so each is paired with that substring when the config is
+loaded and skipped unless the substring occurs; the substring test is a
+single fast C-level search, much cheaper than running the regex.  The
+result is identical to running every pattern.
 """
 
 from __future__ import annotations
 
 import re
+from typing import List, Optional, Tuple
 
-from extract_recipe.boilerplate import redact_patterns
+from extract_recipe import profiling
+from extract_recipe.boilerplate import redact_patterns, required_literal
 
 # Bare UUIDs anywhere in text (e.g. transcript paths inside prompts)
 _UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
 
+# (pattern, replacement, required literal) in application order
+_Plan = List[Tuple[re.Pattern, str, Optional[str]]]
+
+# Plan for the currently loaded [redact] patterns, rebuilt when they change
+_plan_for: Optional[List[Tuple[re.Pattern, str]]] = None
+_plan: _Plan = []
+
+
+def _compile() -> _Plan:
+    pairs = list(redact_patterns()) + [(_UUID_RE, "[UUID]")]
+    return [(p, replacement, required_literal(p)) for p, replacement in pairs]
+
 
 def redact(text: str) -> str:
     """Redact sensitive content from text.
@@ -21,9 +42,20 @@ def redact(text: str) -> str:
     - Applies pattern→replacement pairs from [redact] config section
     - Replaces bare UUIDs with [UUID]
     """
-    for pattern, replacement in redact_patterns():
+    global _plan_for, _plan
+    patterns = redact_patterns()
+    if patterns != _plan_for:
+        _plan = _compile()
+        _plan_for = list(patterns)
+
+    profile = profiling.current
+    if profile is not None:
+        profile.start("redact")
+        size_in = len(text)
+    for pattern, replacement, literal in _plan:
+        if literal is not None and literal not in text:
+            continue
         text = pattern.sub(replacement, text)
-
-    text = _UUID_RE.sub("[UUID]", text)
-
+    if profile is not None:
+        profile.stop(size_in, len(text))
     return text
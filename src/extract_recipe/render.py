@@ -0,0 +1,137 @@
+"""Render the projects of an -a export, optionally in parallel.
+
+Once entries are partitioned, each project's document is independent of
+the others, so with jobs > 1 projects are formatted and redacted in a
+pool of worker processes.  Results still come back in project order:
+each project is handed to the writer as soon as it and every project
+before it are done.  Only a few projects per worker are in flight at a
+time, so memory stays bounded however many projects there are.
+
+Workers load the same pattern config as the parent (it is passed to
+their initialiser), read pastes through their own PasteStore, and share
+the parent's render cache through its directory.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from pathlib import Path
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+from extract_recipe.boilerplate import init as init_config
+from extract_recipe.formatter import iter_json, iter_jsonl, iter_markdown
+from extract_recipe.history import Session
+from extract_recipe.output import Chunk
+from extract_recipe.profiling import timed_iter
+from extract_recipe.rendercache import RenderCache
+
+# Projects submitted ahead of the writer, per worker
+_AHEAD_PER_WORKER = 2
+
+
+def iter_project(
+    project: str,
+    sessions: List[Session],
+    paste_cache_dir: Path,
+    output_format: str = "markdown",
+    raw: bool = False,
+    redact: bool = False,
+    title: Optional[str] = None,
+    depth: int = 1,
+    omit_same_raw: bool = False,
+    cache: Optional[RenderCache] = None,
+) -> Iterator[Chunk]:
+    """Yield one project's part of an -a export, redacted if asked.
+
+    Markdown and JSON Lines come as blocks to be joined with newlines
+    (large markdown pastes as PasteRegions unless redacting); JSON as
+    pieces to be concatenated, the project object indented to sit depth
+    levels deep (1: inside the export's array, 0: a document of its
+    own).  Prompts are formatted only as the chunks are consumed, or
+    read from cache.  omit_same_raw applies to JSON formats only.
+    """
+    if output_format == "json":
+        return timed_iter("format_json", iter_json(
+            project, sessions, paste_cache_dir, raw=raw, redact=redact, title=title,
+            depth=depth, omit_same_raw=omit_same_raw, cache=cache,
+        ))
+    if output_format == "jsonl":
+        return timed_iter("format_jsonl", iter_jsonl(
+            project, sessions, paste_cache_dir, raw=raw, redact=redact, title=title,
+            omit_same_raw=omit_same_raw, cache=cache,
+        ))
+    return timed_iter("format_markdown", iter_markdown(
+        project, sessions, paste_cache_dir, raw=raw, redact=redact,
+        title=title, paste_regions=not redact, cache=cache,
+    ))
+
+
+def render_project(*args, **kwargs) -> List[Chunk]:
+    """Return iter_project() output as a list, as pool workers send it."""
+    return list(iter_project(*args, **kwargs))
+
+
+def render_projects(
+    projects_sessions: Iterable[Tuple[str, List[Session]]],
+    paste_cache_dir: Path,
+    output_format: str = "markdown",
+    raw: bool = False,
+    redact: bool = False,
+    title: Optional[str] = None,
+    jobs: int = 1,
+    config: Optional[Path] = None,
+    depth: int = 1,
+    omit_same_raw: bool = False,
+    cache: Optional[RenderCache] = None,
+) -> Iterator[Iterable[Chunk]]:
+    """Yield iter_project() output for each project, in order.
+
+    Serially, each project's chunks are produced as they are written, so
+    only one prompt is held at a time.  With jobs > 1 projects are
+    rendered whole in a process pool of that size; config is the pattern
+    config file the workers should load.
+    """
+    options = dict(
+        output_format=output_format, raw=raw, redact=redact, title=title, depth=depth,
+        omit_same_raw=omit_same_raw, cache=cache,
+    )
+    if jobs <= 1:
+        for project, sessions in projects_sessions:
+            yield iter_project(project, sessions, paste_cache_dir, **options)
+        return
+
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=init_config, initargs=(config,)
+    ) as pool:
+        pending: Deque[Future] = deque()
+        for project, sessions in projects_sessions:
+            pending.append(pool.submit(
+                render_project, project, sessions, paste_cache_dir, **options
+            ))
+            if len(pending) >= jobs * _AHEAD_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def join_blocks(rendered: Iterable[Iterable[Chunk]]) -> Iterator[Chunk]:
+    """Lazily join rendered markdown or JSON Lines projects into one document."""
+    first = True
+    for blocks in rendered:
+        for block in blocks:
+            if not first:
+                yield "\n"
+            yield block
+            first = False
+
+
+def join_json(rendered: Iterable[Iterable[Chunk]]) -> Iterator[Chunk]:
+    """Lazily join rendered JSON projects into an indent=2 array."""
+    empty = True
+    for chunks in rendered:
+        yield "[\n  " if empty else ",\n  "
+        yield from chunks
+        empty = False
+    yield "[]" if empty else "\n]"
@@ -0,0 +1,240 @@
+"""Persistent cache of rendered sessions.
+
+A session's part of a recipe depends only on its entries, the paste
+files they reference, the pattern config and the output options.  Most
+of a history is unchanged from one run to the next, so each session's
+rendered chunks are stored under ~/.cache/extract-recipe/render/ and
+reused while their fingerprint matches:
+
+  - the format, flags (raw, redact, omit_same_raw), JSON indent depth,
+    and for JSON Lines the project label
+  - with redact, the session's number, which depends on the sessions
+    and context breaks before it
+  - the session ID, and each prompt's timestamp and text (after skip
+    and strip) with the content hash and file size of its pastes
+  - a digest of the [strip], [skip], [plan] and [redact] patterns
+
+A session that gains prompts gets a new fingerprint and is rendered
+again; only the sessions that changed cost formatting, paste reads and
+redaction.  Large pastes left as PasteRegions are stored as references
+to their paste-cache file, not copied.
+
+Chunks are written to the cache as they are produced, with marshal as
+in the history index.  A cached session is read back whole before any
+of it is output, so a truncated or damaged file counts as a miss and
+the session is rendered again, instead of failing halfway through a
+document.  Files are published by rename, and a hit refreshes the
+file's mtime; evict() removes the least recently used files once the
+cache exceeds its size budget.
+
+The fragments hold prompt and paste text before redaction, so the
+cache directory is private to its owner (0700) and each file is
+created 0600.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import marshal
+import os
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+
+from extract_recipe import profiling
+from extract_recipe.boilerplate import section_digest
+from extract_recipe.history import Session
+from extract_recipe.index import private_dir
+from extract_recipe.output import Chunk
+from extract_recipe.paste import PasteRegion
+
+# Bump when a change to the formatters would make cached sessions stale
+CACHE_VERSION = 1
+
+# Default size budget for the cache directory
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_SUFFIX = ".frag"
+
+# Errors reading back a truncated, damaged or unreadable fragment
+_DAMAGED = (EOFError, ValueError, TypeError, IndexError, OSError)
+
+# A temporary file this old was left by a process killed while writing
+# it (e.g. by SIGPIPE when output is piped to head)
+_STALE_TMP_SECONDS = 3600
+
+
+def _encode(chunk: Chunk) -> object:
+    """Return chunk in a form marshal accepts (PasteRegions as tuples)."""
+    if isinstance(chunk, str):
+        return chunk
+    return [p if isinstance(p, str) else (str(p.path), p.size) for p in chunk]
+
+
+def _decode(obj: object) -> Chunk:
+    if isinstance(obj, str):
+        return obj
+    return [p if isinstance(p, str) else PasteRegion(Path(p[0]), p[1]) for p in obj]
+
+
+class RenderCache:
+    """Rendered sessions stored in directory, at most max_bytes in total.
+
+    Picklable, so -a render workers can share it through the directory.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def options(self, *parts: object) -> str:
+        """Return the part of every fingerprint common to one document."""
+        digest = section_digest("strip", "skip", "plan", "redact")
+        return ":".join([str(CACHE_VERSION), digest, *map(str, parts)])
+
+    def key(
+        self, options: str, session: Session, number: int, sizes: Dict[str, int]
+    ) -> str:
+        """Return the fingerprint of session rendered with options.
+
+        number is the session's number in redacted output (pass 0 when
+        it does not appear); sizes maps paste hashes to file sizes.
+        """
+        h = hashlib.sha1(f"{options}\n{session.session_id}\n{number}\n".encode("utf-8"))
+        for entry in session.prompts:
+            display = entry.display.encode("utf-8", "surrogatepass")
+            h.update(f"{entry.timestamp}:{len(display)}:".encode("utf-8"))
+            h.update(display)
+            for paste_id, ref in entry.pasted_contents.items():
+                size = sizes.get(ref.content_hash, -1)
+                h.update(f"{paste_id}={ref.content_hash}:{size};".encode("utf-8"))
+            h.update(b"\n")
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{_SUFFIX}"
+
+    def cached(self, key: str, render: Callable[[], Iterable[Chunk]]) -> Iterator[Chunk]:
+        """Yield the chunks stored under key, or those of render(), storing them."""
+        path = self._path(key)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            f = None
+        if f is not None:
+            with f:
+                chunks = _read_chunks(f)
+            if chunks is not None:
+                if profiling.current is not None:
+                    profiling.current.count("render_cache_hits")
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                yield from chunks
+                return
+        if profiling.current is not None:
+            profiling.current.count("render_cache_misses")
+        yield from self._store(path, render())
+
+    def _store(self, path: Path, chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        """Yield chunks, storing them at path once all have been consumed.
+
+        The cache is an optimisation: if it cannot be written (a
+        read-only home, a full disk), chunks are yielded all the same.
+        """
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        f: Optional[BinaryIO]
+        try:
+            private_dir(self.directory)
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            f = _dump(os.fdopen(fd, "wb"), CACHE_VERSION)
+        except OSError:
+            f = None
+        try:
+            for chunk in chunks:
+                if f is not None:
+                    f = _dump(f, _encode(chunk))
+                yield chunk
+            if f is not None and _dump(f, None) is not None:
+                try:
+                    f.close()
+                    os.replace(tmp, path)
+                except OSError:
+                    pass
+                f = None
+        finally:
+            # Unless published, drop what was written, also if the
+            # consumer stopped early
+            if f is not None:
+                _close(f)
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+
+    def evict(self) -> None:
+        """Remove least recently used files until the cache fits max_bytes.
+
+        Also removes stale temporary files.
+        """
+        files: List[tuple] = []
+        total = 0
+        stale = time.time() - _STALE_TMP_SECONDS
+        try:
+            with os.scandir(self.directory) as it:
+                for de in it:
+                    try:
+                        st = de.stat()
+                        if de.name.endswith(".tmp") and st.st_mtime < stale:
+                            os.unlink(de.path)
+                            continue
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime_ns, st.st_size, de.path))
+                    total += st.st_size
+        except OSError:
+            return
+        if total <= self.max_bytes:
+            return
+        files.sort()
+        for _, size, path in files:
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+def _dump(f: BinaryIO, obj: object) -> Optional[BinaryIO]:
+    """Write obj to f and return f, or close f and return None on failure."""
+    try:
+        marshal.dump(obj, f)
+        return f
+    except OSError:
+        _close(f)
+        return None
+
+
+def _close(f: BinaryIO) -> None:
+    try:
+        f.close()
+    except OSError:
+        pass
+
+
+def _read_chunks(f: BinaryIO) -> Optional[List[Chunk]]:
+    """Return the chunks stored in f, or None if it is stale or damaged."""
+    try:
+        if marshal.load(f) != CACHE_VERSION:
+            return None
+        chunks = []
+        while True:
+            obj = marshal.load(f)
+            if obj is None:
+                return chunks
+            chunks.append(_decode(obj))
+    except _DAMAGED:
+        return None
@@ -0,0 +1,437 @@
+"""Serve extract-recipe requests from a long-running process (--serve).
+
+Each run of extract-recipe pays for interpreter start-up, compiling the
+pattern config, loading the history index and parsing, skipping and
+stripping the prompts it needs.  A server started with --serve keeps
+all of that in memory:
+
+  - the history index (see index.py), brought up to date as lines are
+    appended to history.jsonl, which a Watcher reports as they happen
+  - every prompt it has parsed and prepared (skip and strip applied),
+    by byte offset, so each history line is decoded once
+  - the compiled patterns of each config file used, and the paste store
+    with its LRU of paste contents, rescanned when the paste cache
+    changes
+
+Requests come from extract-recipe-client (see client.py) over a Unix
+socket that only the owner can connect to.  Each request is run with
+its own arguments and working directory, as extract-recipe would run
+it, writing to the client's own standard output and error in the
+encodings the client's streams use; the output is byte-identical.  A
+request for another --claude-dir than the server's is run without the
+hot state.
+
+Each connection is served by a forked child process, which starts from
+the server's state without copying it.  A client that is slow to read
+its output (piped to less) or never sends its request only holds up
+its own child, which gives up on a request not received within
+RECEIVE_TIMEOUT seconds; other requests and the server's own updates
+carry on.  A child's work is lost when it exits, so the server parses
+and prepares (skip and strip applied) every line itself as it arrives,
+and requests find them ready unless they use other patterns or -R.
+
+Before each request the history file and paste cache are checked again,
+so a change the Watcher has not reported yet is never missed.  If the
+history is rewritten rather than appended to, or the [skip] or [plan]
+patterns change, the index is rebuilt and the parsed prompts dropped.
+Malformed lines are reported once by the server, and again by requests
+that parse them for themselves.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, TextIO, Tuple
+
+from extract_recipe.boilerplate import section_digest
+from extract_recipe.cli import run
+from extract_recipe.client import FORWARDED_ENV, default_socket_path
+from extract_recipe.history import (
+    MALFORMED_ERRORS,
+    ProjectStats,
+    PromptEntry,
+    parse_entry,
+    warn_malformed,
+)
+from extract_recipe.index import HistoryIndex, open_index, private_dir, update_index
+from extract_recipe.paste import get_store
+from extract_recipe.profiling import stage
+from extract_recipe.watch import POLL_INTERVAL, Watcher
+
+# Largest request accepted (arguments, working directory, environment)
+_MAX_REQUEST = 1024 * 1024
+
+# Seconds a client has to send its request once connected
+RECEIVE_TIMEOUT = 10.0
+
+_Prepare = Callable[[List[PromptEntry], bool], Sequence[PromptEntry]]
+
+
+class HotHistory:
+    """The index and prepared prompts of one Claude directory, kept in memory."""
+
+    def __init__(self, claude_dir: Path, use_cache: bool = True) -> None:
+        self.claude_dir = claude_dir
+        self.use_cache = use_cache
+        self.index: Optional[HistoryIndex] = None
+        # Prepared entries by byte offset, for raw and stripped text (None
+        # for skipped or malformed lines), and the patterns they depend on
+        self._prepared: Dict[bool, Dict[int, Optional[PromptEntry]]] = {}
+        self._prepared_config = ""
+        # list_projects() results by raw, with the index size and paste
+        # sizes they were computed from
+        self._listed: Dict[bool, Tuple[int, Dict[str, int], List[ProjectStats]]] = {}
+        self._paste_mtime: Optional[int] = None
+
+    @property
+    def history_file(self) -> Path:
+        return self.claude_dir / "history.jsonl"
+
+    @property
+    def paste_cache_dir(self) -> Path:
+        return self.claude_dir / "paste-cache"
+
+    def open(self) -> HistoryIndex:
+        """Return the index, brought up to date with history.jsonl.
+
+        Raises FileNotFoundError if the history file does not exist.
+        """
+        index = self.index
+        try:
+            if index is None or index.config != section_digest("skip", "plan"):
+                index = open_index(self.claude_dir, use_cache=self.use_cache)
+            else:
+                index = update_index(self.history_file, index)
+        except FileNotFoundError:
+            self.index = None
+            self._prepared.clear()
+            self._listed.clear()
+            raise
+        if index is not self.index:
+            # Offsets into a rewritten file mean nothing
+            self._prepared.clear()
+            self._listed.clear()
+            self.index = index
+        self._refresh_pastes()
+        return index
+
+    def _refresh_pastes(self, force: bool = False) -> None:
+        try:
+            mtime: Optional[int] = self.paste_cache_dir.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        if force or mtime != self._paste_mtime:
+            self._paste_mtime = mtime
+            get_store(self.paste_cache_dir).refresh()
+
+    def changed(self, paths: Set[Path]) -> None:
+        """Take in changes reported by a Watcher."""
+        if self.paste_cache_dir in paths:
+            # Also catches pastes rewritten in place, unlike the mtime check
+            self._refresh_pastes(force=True)
+        if self.history_file in paths and self.index is not None:
+            try:
+                self.open()
+            except OSError:
+                pass
+
+    def list_projects(self, raw: bool, paste_sizes: Dict[str, int]) -> List[ProjectStats]:
+        """Return index.list_projects(), recomputed only after changes."""
+        listed = self._listed.get(raw)
+        if listed is None or listed[0] != self.index.size or listed[1] is not paste_sizes:
+            listed = (self.index.size, paste_sizes, self.index.list_projects(raw, paste_sizes))
+            self._listed[raw] = listed
+        return listed[2]
+
+    def warm(self, prepare: _Prepare) -> None:
+        """Parse and prepare, without raw, every line not seen yet.
+
+        Also lists the projects, as --list would, so that the results are
+        there for every forked request.
+        """
+        if self.index is not None:
+            self.load(self.index.paths(raw=True), False, prepare)
+            self.list_projects(False, get_store(self.paste_cache_dir).sizes())
+
+    def load(self, projects: List[str], raw: bool, prepare: _Prepare) -> List[PromptEntry]:
+        """Return the prepared entries of projects, sorted by timestamp.
+
+        Lines not seen before with these patterns are parsed and passed
+        through prepare(entries, raw), which drops skipped entries.
+        """
+        config = section_digest("strip", "skip")
+        if config != self._prepared_config:
+            self._prepared.clear()
+            self._prepared_config = config
+        prepared = self._prepared.setdefault(raw, {})
+        offsets = sorted(
+            offset for p in projects for offset in self.index.project(p).offsets
+        )
+        todo = [offset for offset in offsets if offset not in prepared]
+        if todo:
+            with stage("load_history"):
+                parsed = self._parse(todo)
+            kept = {id(entry) for entry in prepare([entry for _, entry in parsed], raw)}
+            for offset in todo:
+                prepared[offset] = None
+            for offset, entry in parsed:
+                if id(entry) in kept:
+                    prepared[offset] = entry
+        entries = [prepared[offset] for offset in offsets]
+        result = [entry for entry in entries if entry is not None]
+        result.sort(key=lambda e: e.timestamp)
+        return result
+
+    def _parse(self, offsets: List[int]) -> List[Tuple[int, PromptEntry]]:
+        parsed = []
+        with open(self.history_file, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                try:
+                    parsed.append((offset, parse_entry(f.readline())))
+                except MALFORMED_ERRORS as e:
+                    warn_malformed(e)
+        return parsed
+
+
+def _listen(path: Path) -> socket.socket:
+    """Bind a Unix socket at path that only this user can connect to.
+
+    A missing directory for it is created 0700.  A stale socket left by
+    a server that died is replaced; exits if another server is listening.
+    """
+    if not path.parent.exists():
+        private_dir(path.parent)
+    if path.is_socket():
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(path))
+        except OSError:
+            path.unlink()
+        else:
+            print(f"Error: a server is already listening on {path}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            probe.close()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)
+    try:
+        sock.bind(str(path))
+    finally:
+        os.umask(umask)
+    sock.listen(16)
+    return sock
+
+
+def _receive(conn: socket.socket) -> Optional[Tuple[dict, List[int]]]:
+    """Read a request and the descriptors sent with it.
+
+    Returns None for a connection closed without a request (such as a
+    second server checking whether this one is running).
+    """
+    data, fds, _, _ = socket.recv_fds(conn, 65536, 2)
+    if not data and not fds:
+        return None
+    chunks = [data]
+    size = len(data)
+    while data and size <= _MAX_REQUEST:
+        data = conn.recv(65536)
+        chunks.append(data)
+        size += len(data)
+    try:
+        request = json.loads(b"".join(chunks))
+        if len(fds) != 2 or not isinstance(request.get("argv"), list):
+            raise ValueError("malformed request")
+    except ValueError:
+        for fd in fds:
+            os.close(fd)
+        raise
+    return request, fds
+
+
+def _execute(request: dict, history: HotHistory, out: TextIO, err: TextIO) -> int:
+    """Run one request with output redirected; return its exit status."""
+    saved_env = {name: os.environ.get(name) for name in FORWARDED_ENV}
+    cwd = os.getcwd()
+    status = 0
+    with redirect_stdout(out), redirect_stderr(err):
+        try:
+            os.chdir(request.get("cwd") or cwd)
+            for name in FORWARDED_ENV:
+                os.environ.pop(name, None)
+            env = request.get("env")
+            if isinstance(env, dict):
+                os.environ.update(
+                    (name, value) for name, value in env.items()
+                    if name in FORWARDED_ENV and isinstance(value, str)
+                )
+            run(request["argv"], history)
+        except SystemExit as e:
+            if isinstance(e.code, str):
+                print(e.code, file=err)
+            status = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except BrokenPipeError:
+            status = -signal.SIGPIPE
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        finally:
+            os.chdir(cwd)
+            for name, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+    for f in (out, err):
+        try:
+            f.close()
+        except BrokenPipeError:
+            if f is out and status >= 0:
+                status = -signal.SIGPIPE
+        except OSError:
+            pass
+    return status
+
+
+def _open_stream(fd: int, spec: object, errors: str, **kwargs: int) -> TextIO:
+    """Open a client's descriptor with the [encoding, errors] of its stream.
+
+    Falls back to UTF-8 and the given errors if spec is missing or unusable.
+    """
+    if isinstance(spec, list) and len(spec) == 2 and all(isinstance(s, str) for s in spec):
+        try:
+            codecs.lookup(spec[0])
+            codecs.lookup_error(spec[1])
+            return open(fd, "w", encoding=spec[0], errors=spec[1], **kwargs)
+        except LookupError:
+            pass
+    return open(fd, "w", encoding="utf-8", errors=errors, **kwargs)
+
+
+def _handle(conn: socket.socket, history: HotHistory) -> None:
+    conn.settimeout(RECEIVE_TIMEOUT)
+    try:
+        received = _receive(conn)
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring a bad request: {e}", file=sys.stderr)
+        return
+    if received is None:
+        return
+    conn.settimeout(None)
+    request, (out_fd, err_fd) = received
+    out = _open_stream(out_fd, request.get("stdout"), "strict")
+    err = _open_stream(err_fd, request.get("stderr"), "backslashreplace", buffering=1)
+    status = _execute(request, history, out, err)
+    try:
+        conn.sendall(f"{status}\n".encode("ascii"))
+    except OSError:
+        pass  # the client went away
+
+
+def _fork(conn: socket.socket, history: HotHistory, inherited: Iterable[object]) -> int:
+    """Serve conn in a child process; return its pid.
+
+    The child closes the server's descriptors in inherited (objects with
+    a close() method) and exits without returning.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid:
+        return pid
+    status = 1
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        for obj in inherited:
+            obj.close()
+        _handle(conn, history)
+        status = 0
+    except KeyboardInterrupt:
+        pass
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        # Never return into the server's loop (or its cleanup)
+        os._exit(status)
+
+
+def _reap(children: Set[int]) -> None:
+    """Forget the children in children that have exited."""
+    for pid in list(children):
+        try:
+            done, _ = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            done = pid
+        if done:
+            children.discard(pid)
+
+
+def serve(
+    claude_dir: Path, socket_path: Optional[str] = None, use_cache: bool = True,
+    prepare: Optional[_Prepare] = None,
+) -> None:
+    """Answer requests on socket_path until interrupted.
+
+    prepare(entries, raw) is how requests prepare entries; the server
+    applies it to every line ahead of them.
+    """
+    # Broken client pipes must fail the request, not kill the server
+    signal.signal(signal.SIGPIPE, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    history = HotHistory(claude_dir.resolve(), use_cache=use_cache)
+    try:
+        history.open()
+    except FileNotFoundError:
+        pass  # served as an error until it exists
+    if prepare is not None:
+        history.warm(prepare)
+    path = Path(socket_path or default_socket_path())
+    listener = _listen(path)
+    watcher = Watcher([history.history_file, history.paste_cache_dir])
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    inotify_fd = watcher.fileno()
+    if inotify_fd is not None:
+        selector.register(inotify_fd, selectors.EVENT_READ)
+    how = "polling" if watcher.polling else "inotify"
+    print(f"Serving {history.claude_dir} on {path} (watching with {how})", file=sys.stderr)
+    children: Set[int] = set()
+    try:
+        while True:
+            # While requests run, wake up now and then to reap them
+            wake = watcher.polling or bool(children)
+            events = selector.select(POLL_INTERVAL if wake else None)
+            _reap(children)
+            changes = watcher.changes()
+            if changes:
+                history.changed(changes)
+                if prepare is not None:
+                    history.warm(prepare)
+            if watcher.polling and inotify_fd is not None:
+                selector.unregister(inotify_fd)  # inotify failed; now polling
+                inotify_fd = None
+            for key, _ in events:
+                if key.fileobj is listener:
+                    conn, _ = listener.accept()
+                    with conn:
+                        children.add(_fork(conn, history, (selector, watcher, listener)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        selector.close()
+        watcher.close()
+        listener.close()
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
@@ -0,0 +1,190 @@
+"""Write an -a export as one file per project, rebuilding only what changed.
+
+`-a --out-dir DIR` writes each project to its own file in DIR, plus a
+manifest.json recording, for every project:
+
+  - the file it was written to
+  - its number of history entries and latest timestamp
+  - a fingerprint of the paste-cache files it references
+  - a hash of the pattern config and output options it was rendered with
+
+A rerun takes the same figures from the history index and the paste
+cache directory scan, without parsing any prompts, and renders only the
+projects whose figures differ (or whose file has gone).  history.jsonl
+only grows by appending, so a project with the same entry count and
+latest timestamp has the same prompts.  Files of projects that are no
+longer exported are removed.
+
+DIR is meant to be published, so the manifest is not trusted: an entry
+is only read if its file is a name _file_name() could have made, and
+only such a file directly inside DIR is ever removed.  With --redact the
+manifest is keyed by file name rather than by project path, which would
+otherwise be published there unredacted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from extract_recipe.boilerplate import section_digest
+from extract_recipe.history import PromptEntry, partition_by_project
+from extract_recipe.index import HistoryIndex
+from extract_recipe.output import write_file
+from extract_recipe.paste import get_store
+from extract_recipe.profiling import timed_iter
+from extract_recipe.redact import redact as redact_text
+from extract_recipe.render import join_blocks, render_projects
+from extract_recipe.rendercache import RenderCache
+
+MANIFEST_NAME = "manifest.json"
+
+# Bump when a change to the output would make existing files stale
+MANIFEST_VERSION = 4
+
+_UNSAFE_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+_EXTENSIONS = {"json": "json", "jsonl": "jsonl"}
+
+# The names _file_name() makes: a slug that does not start with "." or
+# "-", a hash suffix and an extension
+_FILE_NAME_RE = re.compile(r"[A-Za-z0-9_][A-Za-z0-9._-]*-[0-9a-f]{8}\.(?:md|json|jsonl)")
+
+
+@dataclass
+class ShardState:
+    """What a project's file was rendered from."""
+    file: str
+    entries: int
+    last_timestamp: int
+    pastes: str
+    config: str
+
+
+def _file_name(project: str, output_format: str, redact: bool) -> str:
+    """Return a file name for project, unique thanks to a hash suffix."""
+    label = redact_text(project) if redact else project
+    slug = _UNSAFE_RE.sub("-", label).strip("-.") or "project"
+    digest = hashlib.sha1(project.encode("utf-8", "surrogatepass")).hexdigest()[:8]
+    return f"{slug}-{digest}.{_EXTENSIONS.get(output_format, 'md')}"
+
+
+def _paste_fingerprint(hashes: Sequence[Tuple[Optional[str], ...]], sizes: Dict[str, int]) -> str:
+    h = hashlib.sha1()
+    for row in hashes:
+        for content_hash in row:
+            h.update(f"{content_hash}:{sizes.get(content_hash, -1)}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _manifest_key(project: str, state: ShardState, redact: bool) -> str:
+    return state.file if redact else project
+
+
+def _read_manifest(path: Path) -> Dict[str, ShardState]:
+    """Return the manifest's entries, leaving out any whose file is not ours."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        states = {key: ShardState(**state) for key, state in data["projects"].items()}
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        return {}
+    return {
+        key: state for key, state in states.items()
+        if isinstance(state.file, str) and _FILE_NAME_RE.fullmatch(state.file)
+    }
+
+
+def _write_manifest(path: Path, states: Dict[str, ShardState]) -> None:
+    data = {
+        "version": MANIFEST_VERSION,
+        "projects": {p: asdict(states[p]) for p in sorted(states)},
+    }
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def export_dir(
+    out_dir: Path,
+    index: HistoryIndex,
+    load: Callable[[List[str]], Sequence[PromptEntry]],
+    paste_cache_dir: Path,
+    output_format: str = "markdown",
+    raw: bool = False,
+    redact: bool = False,
+    title: Optional[str] = None,
+    jobs: int = 1,
+    config: Optional[Path] = None,
+    omit_same_raw: bool = False,
+    cache: Optional[RenderCache] = None,
+) -> Tuple[int, int]:
+    """Bring the per-project files in out_dir up to date.
+
+    load(projects) must return the prepared (skip-filtered and stripped)
+    entries of the given projects; projects that are rendered reuse
+    their unchanged sessions from cache.  Returns (files written,
+    projects).
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / MANIFEST_NAME
+    old = _read_manifest(manifest_path)
+
+    options = f"{MANIFEST_VERSION}:{output_format}:{raw}:{redact}:{title}:{omit_same_raw}"
+    config_hash = hashlib.sha1(
+        (options + section_digest("strip", "skip", "plan", "redact")).encode("utf-8")
+    ).hexdigest()
+    sizes = get_store(paste_cache_dir).sizes()
+
+    states: Dict[str, ShardState] = {}
+    todo: List[str] = []
+    for project in index.paths(raw):
+        proj = index.project(project)
+        state = ShardState(
+            file=_file_name(project, output_format, redact),
+            entries=len(proj.offsets),
+            last_timestamp=max(proj.timestamps),
+            pastes=_paste_fingerprint(list(proj.pastes.values()), sizes),
+            config=config_hash,
+        )
+        states[project] = state
+        if old.get(_manifest_key(project, state, redact)) != state or not (out_dir / state.file).exists():
+            todo.append(project)
+
+    written = 0
+    if todo:
+        projects_sessions = list(timed_iter("group_by_session", partition_by_project(load(todo))))
+        rendered = render_projects(
+            projects_sessions, paste_cache_dir, output_format=output_format,
+            raw=raw, redact=redact, title=title, jobs=jobs, config=config, depth=0,
+            omit_same_raw=omit_same_raw, cache=cache,
+        )
+        for (project, _), chunks in zip(projects_sessions, rendered):
+            if output_format != "json":
+                chunks = join_blocks([chunks])
+            write_file(out_dir / states[project].file, chunks)
+            written += 1
+        for project in set(todo) - {p for p, _ in projects_sessions}:
+            del states[project]  # nothing left to export
+
+    current = {state.file for state in states.values()}
+    resolved_dir = out_dir.resolve()
+    for state in old.values():
+        path = out_dir / state.file
+        if state.file not in current and path.resolve().parent == resolved_dir:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+    _write_manifest(
+        manifest_path,
+        {_manifest_key(p, state, redact): state for p, state in states.items()},
+    )
+    return written, len(states)
+
@@ -0,0 +1,219 @@
+"""Wait for changes to files such as history.jsonl.
+
+On Linux a Watcher uses inotify (through ctypes, so without extra
+dependencies): it sleeps in the kernel until a watched file is written,
+created, moved or deleted, and costs nothing while the files are idle.
+Each path is watched through its parent directory, filtered by name, so
+a file that does not exist yet, or is replaced by a rename, is still
+seen.  A watched path that is a directory (the paste cache) also counts
+as changed when anything inside it changes.
+
+Elsewhere, or if inotify is unavailable (no watches left, a missing
+parent directory), the Watcher polls instead: it compares each path's
+inode, size and mtime every POLL_INTERVAL seconds.  inotify does not
+see writes made on another host to a network filesystem, so callers
+that must not miss a change should still check the files themselves
+before relying on them; changes() only says when to look.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Seconds between checks when polling
+POLL_INTERVAL = 0.5
+
+# inotify event bits (from <sys/inotify.h>)
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+
+_DIR_EVENTS = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+    | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR
+)
+
+# struct inotify_event: int wd; uint32_t mask, cookie, len; char name[len]
+_EVENT = struct.Struct("iIII")
+
+Signature = Optional[Tuple[int, int, int]]
+
+
+def _signature(path: Path) -> Signature:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _inotify() -> Optional[ctypes.CDLL]:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class Watcher:
+    """Report which of a set of paths changed, waiting for it if asked.
+
+    Use fileno() with select() (None when polling, in which case wake up
+    every POLL_INTERVAL seconds) and then changes(), or simply wait().
+    """
+
+    def __init__(self, paths: Iterable[Path], poll: bool = False) -> None:
+        self.paths: List[Path] = [Path(p) for p in paths]
+        self._signatures: Dict[Path, Signature] = {p: _signature(p) for p in self.paths}
+        self._fd: Optional[int] = None
+        # Watch descriptor -> (watched directory, whether it is a watched path)
+        self._watches: Dict[int, Tuple[Path, bool]] = {}
+        self._buffer = b""
+        libc = None if poll else _inotify()
+        if libc is not None:
+            self._libc = libc
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+                if not all(self._add_watches(p) for p in self.paths):
+                    self.close()
+
+    @property
+    def polling(self) -> bool:
+        return self._fd is None
+
+    def fileno(self) -> Optional[int]:
+        """Return the inotify descriptor to select() on, or None if polling."""
+        return self._fd
+
+    def _add_watch(self, directory: Path, own: bool) -> bool:
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), _DIR_EVENTS
+        )
+        if wd < 0:
+            return False
+        self._watches[wd] = (directory, own)
+        return True
+
+    def _add_watches(self, path: Path) -> bool:
+        if not self._add_watch(path.parent, False):
+            return False
+        if path.is_dir():
+            self._add_watch(path, True)
+        return True
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._watches.clear()
+
+    def __enter__(self) -> "Watcher":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def changes(self) -> Set[Path]:
+        """Return the paths that changed since the last call, without waiting."""
+        if self._fd is None:
+            return self._poll()
+        changed: Set[Path] = set()
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                # Lost the descriptor; carry on by polling
+                self.close()
+                return self._poll() | set(self.paths)
+            if not data:
+                break
+            self._buffer += data
+            changed |= self._parse()
+        for path in changed:
+            self._signatures[path] = _signature(path)
+        return changed
+
+    def _parse(self) -> Set[Path]:
+        changed: Set[Path] = set()
+        buf = self._buffer
+        pos = 0
+        while pos + _EVENT.size <= len(buf):
+            wd, mask, _, length = _EVENT.unpack_from(buf, pos)
+            end = pos + _EVENT.size + length
+            if end > len(buf):
+                break
+            name = buf[pos + _EVENT.size:end].rstrip(b"\0")
+            pos = end
+            if mask & _IN_Q_OVERFLOW:
+                changed.update(self.paths)
+                continue
+            watch = self._watches.get(wd)
+            if watch is None:
+                continue
+            directory, own = watch
+            if mask & _IN_IGNORED:
+                del self._watches[wd]
+            if own:
+                changed.add(directory)
+                continue
+            if not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if path in self._signatures:
+                changed.add(path)
+                # A watched directory that was (re)created needs its own watch
+                if mask & (_IN_CREATE | _IN_MOVED_TO) and path.is_dir():
+                    self._add_watch(path, True)
+        self._buffer = buf[pos:]
+        return changed
+
+    def _poll(self) -> Set[Path]:
+        changed: Set[Path] = set()
+        for path in self.paths:
+            signature = _signature(path)
+            if signature != self._signatures[path]:
+                self._signatures[path] = signature
+                changed.add(path)
+        return changed
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Return the paths that changed, waiting up to timeout seconds.
+
+        Returns an empty set if nothing changed in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = self.changes()
+            if changed:
+                return changed
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return changed
+            if self._fd is None:
+                time.sleep(POLL_INTERVAL if remaining is None else min(remaining, POLL_INTERVAL))
+            else:
+                select.select([self._fd], [], [], remaining)